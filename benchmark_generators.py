@@ -0,0 +1,334 @@
+
+# Blender 3.5.1.
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+
+# Launcher and core benchmarks run with plain Python, generator cases run inside `blender -b --python`.
+try:
+    import bpy
+except ImportError:
+    bpy = None
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from ink_nature import core
+from generate_farm import load_script
+
+# Generator script -> (synthetic input kind, source collection the script reads from).
+GENERATORS = {
+    "copy_animate_curve_bevel.py": ("curves", "grass1_guides"),
+    "copy_animate_curve_extrude.py": ("curves", "grass2_guides"),
+    "grow_around_curve.py": ("curves", "pillar_grow_curve_guide"),
+    "procedural_spline_polygons.py": ("mesh", "crown"),
+    "procedural_feature_edges.py": ("mesh", "crown")}
+
+def script_args():
+    # Blender passes arguments after "--" to the script untouched.
+    argv = sys.argv
+    return argv[argv.index("--") + 1:] if "--" in argv else argv[1:]
+
+def peak_rss_mb():
+    # Peak resident memory of this process (ru_maxrss is in KB on Linux).
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+#
+# Synthetic inputs.
+#
+def guide_curve_points(n_points, guide_index):
+    """
+        Points (M, 3) of a wavy vertical grass-like guide.
+    """
+    t = np.linspace(0.0, 1.0, n_points)
+    phase = guide_index * 0.37
+    return np.stack((0.2 * np.sin(4.0 * t + phase), 0.2 * np.cos(3.0 * t + phase), 2.0 * t), axis=-1)
+
+def grid_mesh_arrays(n_polygons):
+    """
+        Quad grid with about n_polygons faces and gentle waves (so creases vary), as the same
+        dict of arrays as ink_nature.blender.read_mesh_arrays() returns.
+    """
+    nx = ny = max(1, int(np.ceil(np.sqrt(n_polygons))))
+    x, y = np.meshgrid(np.arange(nx + 1, dtype=np.float64), np.arange(ny + 1, dtype=np.float64))
+    z = 0.3 * np.sin(x * 0.9) * np.cos(y * 0.7)
+    co = np.stack((x.ravel(), y.ravel(), z.ravel()), axis=-1) * (10.0 / nx)
+    i, j = np.meshgrid(np.arange(nx), np.arange(ny))
+    i, j = i.ravel(), j.ravel()
+    v00 = j * (nx + 1) + i
+    loop_vertices = np.stack((v00, v00 + 1, v00 + nx + 2, v00 + nx + 1), axis=-1)
+    # Horizontal edges (i, j) -> j * nx + i, vertical edges (i, j) -> n_horizontal + j * (nx + 1) + i.
+    n_horizontal = nx * (ny + 1)
+    hx, hy = np.meshgrid(np.arange(nx), np.arange(ny + 1))
+    vx, vy = np.meshgrid(np.arange(nx + 1), np.arange(ny))
+    h0 = (hy * (nx + 1) + hx).ravel()
+    v0 = (vy * (nx + 1) + vx).ravel()
+    edge_vertices = np.concatenate((np.stack((h0, h0 + 1), axis=-1), np.stack((v0, v0 + nx + 1), axis=-1)))
+    loop_edges = np.stack((j * nx + i, n_horizontal + j * (nx + 1) + i + 1, (j + 1) * nx + i, n_horizontal + j * (nx + 1) + i), axis=-1)
+    p = co[loop_vertices]
+    normals = np.cross(p[:, 2] - p[:, 0], p[:, 3] - p[:, 1])
+    normals /= np.linalg.norm(normals, axis=1)[:, np.newaxis]
+    n_faces = len(loop_vertices)
+    return {
+        "co": co,
+        "edge_vertices": edge_vertices,
+        "is_seam": np.zeros(len(edge_vertices), dtype=bool),
+        "loop_vertices": loop_vertices.ravel(),
+        "loop_edges": loop_edges.ravel(),
+        "loop_start": np.arange(n_faces) * 4,
+        "loop_total": np.full(n_faces, 4),
+        "material_index": np.zeros(n_faces, dtype=np.int64),
+        "normals": normals,
+        "centers": p.mean(axis=1)}
+
+def build_guide_curves(collection_name, n_guides, n_points):
+    """
+        n_guides bezier guide curves with n_points control points each, on a grid, in a new collection.
+    """
+    collection = bpy.data.collections.new(collection_name)
+    bpy.context.scene.collection.children.link(collection)
+    side = int(np.ceil(np.sqrt(n_guides)))
+    for guide_index in range(n_guides):
+        curve = bpy.data.curves.new("guide_{:05d}".format(guide_index), type='CURVE')
+        curve.dimensions = '3D'
+        spline = curve.splines.new('BEZIER')
+        spline.bezier_points.add(n_points - 1)
+        co = guide_curve_points(n_points, guide_index).astype(np.float32)
+        spline.bezier_points.foreach_set("co", co.ravel())
+        spline.bezier_points.foreach_set("handle_left", co.ravel())
+        spline.bezier_points.foreach_set("handle_right", co.ravel())
+        for point in spline.bezier_points:
+            point.handle_left_type = 'AUTO'
+            point.handle_right_type = 'AUTO'
+        obj = bpy.data.objects.new(curve.name, curve)
+        obj.location = ((guide_index % side) * 3.0, (guide_index // side) * 3.0, 0.0)
+        collection.objects.link(obj)
+
+def build_grid_mesh(collection_name, n_polygons):
+    """
+        Grid mesh object with about n_polygons faces in a new collection, filled with foreach_set.
+    """
+    arrays = grid_mesh_arrays(n_polygons)
+    mesh = bpy.data.meshes.new("grid")
+    mesh.vertices.add(len(arrays["co"]))
+    mesh.vertices.foreach_set("co", arrays["co"].astype(np.float32).ravel())
+    mesh.loops.add(len(arrays["loop_vertices"]))
+    mesh.loops.foreach_set("vertex_index", arrays["loop_vertices"].astype(np.int32))
+    mesh.polygons.add(len(arrays["loop_start"]))
+    mesh.polygons.foreach_set("loop_start", arrays["loop_start"].astype(np.int32))
+    mesh.polygons.foreach_set("loop_total", arrays["loop_total"].astype(np.int32))
+    mesh.update(calc_edges=True)
+    collection = bpy.data.collections.new(collection_name)
+    bpy.context.scene.collection.children.link(collection)
+    collection.objects.link(bpy.data.objects.new("grid", mesh))
+    # Camera for view-dependent (silhouette) strokes.
+    camera = bpy.data.objects.new("camera", bpy.data.cameras.new("camera"))
+    camera.location = (5.0, -10.0, 8.0)
+    camera.rotation_euler = (np.radians(55.0), 0.0, 0.0)
+    bpy.context.scene.collection.objects.link(camera)
+    bpy.context.scene.camera = camera
+
+#
+# Generator cases (inside Blender).
+#
+DATABLOCK_TYPES = ("objects", "curves", "meshes", "actions", "collections", "node_groups", "materials")
+
+def datablock_counts():
+    counts = {name: len(getattr(bpy.data, name)) for name in DATABLOCK_TYPES}
+    counts["keyframes"] = sum(len(fcurve.keyframe_points) for action in bpy.data.actions for fcurve in action.fcurves)
+    counts["analytic_animations"] = sum(len(curve.get("analytic_animation", {})) for curve in bpy.data.curves)
+    return counts
+
+def run_case(script_path, case, result_path):
+    """
+        Build synthetic input for case in empty scene, run generator main() once and write measurements as JSON.
+    """
+    bpy.ops.wm.read_factory_settings(use_empty=True)
+    kind, collection_name = GENERATORS[os.path.basename(script_path)]
+    if kind == "curves":
+        build_guide_curves(collection_name, case["n_guides"], case["n_points"])
+    else:
+        build_grid_mesh(collection_name, case["n_polygons"])
+    module = load_script(script_path)
+    before = datablock_counts()
+    rss_before = peak_rss_mb()
+    time_start = time.perf_counter()
+    module.main(seed=case["seed"])
+    wall_time = time.perf_counter() - time_start
+    after = datablock_counts()
+    result = dict(case)
+    result.update({
+        "blender": bpy.app.version_string,
+        "wall_time": wall_time,
+        "peak_rss_mb": peak_rss_mb(),
+        "rss_before_mb": rss_before,
+        "created": {name: after[name] - before[name] for name in after}})
+    with open(result_path, "w") as f:
+        json.dump(result, f)
+
+def generator_cases(generators, guides, points, polygons, seed):
+    for script in generators:
+        kind = GENERATORS[script][0]
+        if kind == "curves":
+            for n_guides in guides:
+                for n_points in points:
+                    yield {"generator": script, "n_guides": n_guides, "n_points": n_points, "seed": seed}
+        else:
+            for n_polygons in polygons:
+                yield {"generator": script, "n_polygons": n_polygons, "seed": seed}
+
+def run_generator_cases(blender, cases, timeout, trace_dir=None):
+    """
+        Run every case in its own `blender -b` process (fresh memory peak, empty generator cache).
+        With trace_dir, generators are profiled and write one Chrome trace per case there.
+    """
+    this_script = os.path.abspath(__file__)
+    script_dir = os.path.dirname(this_script)
+    results = []
+    for case in cases:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            result_path = os.path.join(tmp_dir, "result.json")
+            env = dict(os.environ, INK_NATURE_CACHE_DIR=os.path.join(tmp_dir, "cache"))
+            if trace_dir:
+                os.makedirs(trace_dir, exist_ok=True)
+                case_name = "_".join(str(case[key]) for key in sorted(case) if key != "seed").replace(".py", "")
+                env["INK_NATURE_PROFILE"] = os.path.abspath(os.path.join(trace_dir, case_name + ".json"))
+            command = [blender, "-b", "--factory-startup", "--python-exit-code", "1", "--python", this_script, "--",
+                "case", os.path.join(script_dir, case["generator"]), json.dumps(case), result_path]
+            try:
+                process = subprocess.run(command, env=env, timeout=timeout, stdout=subprocess.DEVNULL)
+                failed = process.returncode != 0 or not os.path.exists(result_path)
+            except subprocess.TimeoutExpired:
+                failed = True
+            if failed:
+                result = dict(case, error="failed or timed out")
+            else:
+                with open(result_path) as f:
+                    result = json.load(f)
+        print_result(result)
+        results.append(result)
+    return results
+
+#
+# Core cases (plain Python).
+#
+def measure(function, *args, **kwargs):
+    # Wall time and peak of Python/NumPy allocations during call.
+    tracemalloc.start()
+    time_start = time.perf_counter()
+    function(*args, **kwargs)
+    wall_time = time.perf_counter() - time_start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"wall_time": wall_time, "peak_alloc_mb": peak / 1024.0**2}
+
+def run_core_cases(guides, points, polygons, seed):
+    """
+        Benchmark ink_nature.core stages without Blender, with settings of the generator scripts.
+    """
+    perturb = {"perturb_scale": 5.0, "perturb_strength": 0.4, "n_octaves": 1, "amplitude_scale": 0.5, "frequency_scale": 1.0}
+    stroke_settings = {"curve_n_subdiv": 10, "stroke_spacing": 0.05, "stroke_min_subdiv": 1, "stroke_max_subdiv": 100,
+        "n_strokes_per_edge": 1, "min_dihedral_angle": 0.0, "include_boundary": True, "include_seams": True, "perturb": perturb}
+    feature_settings = {"seed": seed, "stroke_spacing": 0.05, "stroke_min_subdiv": 1, "stroke_max_subdiv": 100, "perturb": perturb}
+    results = []
+    for n_polygons in polygons:
+        mesh = grid_mesh_arrays(n_polygons)
+        matrix_world = np.eye(4)
+        for stroke_mode in ("EDGES", "POLYGONS"):
+            settings = dict(stroke_settings, stroke_mode=stroke_mode)
+            results.append(dict({"generator": "core.mesh_strokes", "stroke_mode": stroke_mode, "n_polygons": n_polygons, "seed": seed},
+                **measure(core.mesh_strokes, mesh, matrix_world, "grid", settings, seed)))
+        def feature_edges():
+            cache = core.feature_edge_cache(mesh, seed, ("grid",))
+            selected = core.static_feature_edges(cache, np.radians(30.0))
+            camera_matrix = np.eye(4)
+            camera_matrix[:3, 3] = (5.0, -10.0, 8.0)
+            selected |= core.silhouette_edges(cache, matrix_world, camera_matrix)
+            core.feature_strokes(cache, selected, matrix_world, "grid", feature_settings)
+        results.append(dict({"generator": "core.feature_strokes", "n_polygons": n_polygons, "seed": seed}, **measure(feature_edges)))
+    for n_guides in guides:
+        for n_points in points:
+            def copies():
+                for guide_index in range(n_guides):
+                    co = guide_curve_points(n_points, guide_index).astype(np.float32)
+                    guide_points = {"bezier_co": co, "handle_left": co, "handle_right": co, "points_co": np.zeros((0, 4), dtype=np.float32)}
+                    core.perturbed_copies(guide_points, "guide_{:05d}".format(guide_index), 10, {"perturb_scale": 2.0, "perturb_strength": 3.0}, seed)
+                    variations = core.copy_variations("guide_{:05d}".format(guide_index), 30, (0.0, 0.0, 0.0), (0.0, 0.0, 0.0), 5, 3, seed)
+                    core.animation_parameters(0, 200, 0.01, variations["scales"])
+            results.append(dict({"generator": "core.copies", "n_guides": n_guides, "n_points": n_points, "seed": seed}, **measure(copies)))
+    for result in results:
+        print_result(result)
+    return results
+
+def print_result(result):
+    size = ", ".join("{}={}".format(name, result[name]) for name in ("stroke_mode", "n_guides", "n_points", "n_polygons") if name in result)
+    if "error" in result:
+        print("{:32s} {:40s} {}".format(result["generator"], size, result["error"]))
+        return
+    memory = result.get("peak_rss_mb", result.get("peak_alloc_mb"))
+    print("{:32s} {:40s} {:9.3f} s {:9.1f} MB".format(result["generator"], size, result["wall_time"], memory or 0.0))
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)), stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def int_list(text):
+    return [int(value) for value in text.split(",") if value]
+
+def main():
+    """
+        Run generators on synthetic scenes of growing size and write timings to JSON, so versions can be
+        compared and scaling regressions caught. Each generator case runs in its own `blender -b` process
+        and records wall time, peak memory, datablocks created and keyframes written.
+        With --core, stages of ink_nature.core are benchmarked on plain Python instead.
+        Usage: python benchmark_generators.py --blender blender --output bench.json
+    """
+    args = script_args()
+    if args and args[0] == "case":
+        run_case(args[1], json.loads(args[2]), args[3])
+        return
+    parser = argparse.ArgumentParser(description="Benchmark generator scripts on synthetic scenes.")
+    parser.add_argument("--blender", default="blender", help="Blender executable.")
+    parser.add_argument("--generators", default=",".join(GENERATORS), help="Comma separated generator scripts.")
+    parser.add_argument("--guides", type=int_list, default=[1, 10, 100], help="Numbers of guide curves.")
+    parser.add_argument("--points", type=int_list, default=[16], help="Numbers of control points per guide.")
+    parser.add_argument("--polygons", type=int_list, default=[100, 1000, 10000, 100000], help="Numbers of mesh polygons.")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed passed to generator main().")
+    parser.add_argument("--timeout", type=float, default=3600.0, help="Seconds per generator case.")
+    parser.add_argument("--core", action="store_true", help="Benchmark ink_nature.core without Blender.")
+    parser.add_argument("--output", default="benchmark.json", help="Results JSON.")
+    parser.add_argument("--trace-dir", default=None, help="Profile generators, write Chrome trace per case to this directory.")
+    parsed = parser.parse_args(args)
+    if parsed.core:
+        results = run_core_cases(parsed.guides, parsed.points, parsed.polygons, parsed.seed)
+    else:
+        cases = generator_cases([name for name in parsed.generators.split(",") if name], parsed.guides, parsed.points, parsed.polygons, parsed.seed)
+        results = run_generator_cases(parsed.blender, cases, parsed.timeout, parsed.trace_dir)
+    report = {
+        "revision": git_revision(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "numpy": np.__version__,
+        "results": results}
+    with open(parsed.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+#
+# Script entry point.
+#
+if __name__ == "__main__":
+    main()
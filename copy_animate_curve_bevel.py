@@ -1,114 +1,104 @@
 
 # Blender 3.5.1.
 
+import os
+import sys
 import bpy
-import mathutils
-import bmesh
 
-# Interpolate [a,b] using factor t.
-def lerp(t, a, b):
-    return (1.0 - t) * a + t * b
+# Shared generator package ink_nature/ is next to this script (or next to the .blend when run from text editor).
+for path in (os.path.dirname(os.path.abspath(__file__)), bpy.path.abspath("//")):
+    if path and path not in sys.path:
+        sys.path.append(path)
 
+from ink_nature.jobs import job_config
+from ink_nature.copies import generate_curve_copies
+from ink_nature.blender import frame_lerp, math_node, named_attribute
 
-# https://blender.stackexchange.com/questions/220072/check-using-name-if-a-collection-exists-in-blend-is-linked-to-scene
-def create_collection_if_not_exists(collection_name):
-    if collection_name not in bpy.data.collections:
-        new_collection = bpy.data.collections.new(collection_name)
-        bpy.context.scene.collection.children.link(new_collection) #Creates a new collection
-
-def add_object_to_collection(base_object, collection_name="collection"):
-    create_collection_if_not_exists(collection_name)
-    bpy.data.collections[collection_name].objects.link(base_object)
-
-def copy_obj(obj, collection_name):
-    obj_cpy = obj.copy()
-    obj_cpy.data = obj.data.copy()
-    obj_cpy.animation_data_clear()
-    if collection_name == None:
-        bpy.context.collection.objects.link(obj_cpy)
-    else:
-        add_object_to_collection(obj_cpy, collection_name)
-    return obj_cpy
-
-def animate_curve_growth(curve, frame_start, frame_end, growth_factor_end, start_growth):
-    curve.data.bevel_factor_end = 0
-    curve.data.bevel_factor_start = start_growth
-    curve.data.keyframe_insert(data_path="bevel_factor_end", frame=frame_start)
-    curve.data.keyframe_insert(data_path="bevel_factor_start", frame=frame_start)
-    curve.data.bevel_factor_start = growth_factor_end
-    curve.data.keyframe_insert(data_path="bevel_factor_start", frame=frame_end)
+def thickness_nodes(tree, group_in, frame, curve):
+    """
+        Instancing mode: animate thickness (radius and profile) of grown curve from per-point attribute thickness_end.
+    """
+    nodes, links = tree.nodes, tree.links
+    # Object scale scaled the whole bevel, realized instances only scale the curve points.
+    thickness = frame_lerp(tree, group_in, frame, group_in.outputs["Start Thickness"], named_attribute(tree, "thickness_end", 'FLOAT'))
+    thickness = math_node(tree, 'MULTIPLY', thickness, named_attribute(tree, "instance_scale", 'FLOAT'))
+    set_radius = nodes.new('GeometryNodeSetCurveRadius')
+    links.new(curve, set_radius.inputs["Curve"])
+    links.new(math_node(tree, 'MULTIPLY', thickness, nodes.new('GeometryNodeInputRadius').outputs["Radius"]), set_radius.inputs["Radius"])
+    profile = nodes.new('GeometryNodeCurvePrimitiveCircle')
+    profile.mode = 'RADIUS'
+    profile.inputs["Radius"].default_value = 1.0
+    links.new(group_in.outputs["Profile Resolution"], profile.inputs["Resolution"])
+    curve_to_mesh = nodes.new('GeometryNodeCurveToMesh')
+    links.new(set_radius.outputs["Curve"], curve_to_mesh.inputs["Curve"])
+    links.new(profile.outputs["Curve"], curve_to_mesh.inputs["Profile Curve"])
+    links.new(group_in.outputs["Fill Caps"], curve_to_mesh.inputs["Fill Caps"])
+    return curve_to_mesh.outputs["Mesh"]
 
-def animate_curve_thickness(curve, frame_start, frame_end, thickness_min, thickness_max, start_thickness=0.0):
-    curve.data.bevel_depth = start_thickness
-    curve.data.keyframe_insert(data_path="bevel_depth", frame=frame_start)
-    curve.data.bevel_depth = lerp(mathutils.noise.random(), thickness_min, thickness_max)
-    curve.data.keyframe_insert(data_path="bevel_depth", frame=frame_end)
+# Animated bevel depth (thickness), see ink_nature.copies.
+COPY_VARIANT = {
+    "generator": "copy_animate_curve_bevel",
+    "data_path": "bevel_depth",
+    "purpose": "thickness",
+    "min_max_key": "curve_thickness_min_max",
+    "start_key": "start_thickness",
+    "node_group": "copy_animate_curve_bevel_instances",
+    "node_inputs": [('NodeSocketFloat', "Start Thickness"), ('NodeSocketInt', "Profile Resolution"), ('NodeSocketBool', "Fill Caps")],
+    "build_nodes": thickness_nodes,
+    "modifier_inputs": lambda base_curve, start_thickness: {
+        "Start Thickness": start_thickness,
+        "Profile Resolution": (base_curve.data.bevel_resolution + 2) * 2,
+        "Fill Caps": base_curve.data.use_fill_caps}}
 
-# https://behreajj.medium.com/scripting-curves-in-blender-with-python-c487097efd13
-def set_animation_fcurve(base_object, option='LINEAR'):
-    fcurves = base_object.data.animation_data.action.fcurves
-    for fcurve in fcurves:
-        for kf in fcurve.keyframe_points:
-            # Options: ['CONSTANT', 'LINEAR', 'BEZIER', 'SINE',
-            # 'QUAD', 'CUBIC', 'QUART', 'QUINT', 'EXPO', 'CIRC',
-            # 'BACK', 'BOUNCE', 'ELASTIC']
-            kf.interpolation = option
-            # Options: ['AUTO', 'EASE_IN', 'EASE_OUT', 'EASE_IN_OUT']
-            kf.easing = 'AUTO'
+# Default parameters of main(), every job can override them (see run_jobs.py).
+CONFIG = {
+    # Apply on all objects in collection.
+    "n_copies_per_base_curve": 30,
+    "translation_factor": 5,
+    "scale_factor": 3,
+    "frame_start": 0,
+    "frame_end": 200,
+    "curve_thickness_min_max": [0.01, 0.1],
+    "target_collection": "grass1_guides",
+    "dest_collection": "grass1_generated",
+    "start_thickness": 0.01,
+    "start_growth": 0.1,
+    "growth_factor_end": 1.0,
+    # Share one curve datablock per guide and vary copies via Geometry Nodes point attributes.
+    "use_instancing": False,
+    # Store growth and thickness as per-copy parameters evaluated by one frame change handler instead of actions.
+    "use_analytic_animation": False,
+    # Camera culling and level of detail: copies outside the scene camera view over [frame_start, frame_end]
+    # are skipped, copies smaller than lod_full_detail_pixels on screen are thinned out and get lower curve resolution.
+    "use_camera_lod": False,
+    "lod_full_detail_pixels": 64.0,
+    "lod_min_fraction": 0.1,
+    # Tiled streaming for large scatter areas: copies are grouped into tile_size x tile_size (XY) tiles, every tile
+    # is written to its own library .blend in tile_dir and released before the next one, so memory stays flat.
+    # With link_generated_tiles, tiles overlapping link_region (min_x, min_y, max_x, max_y; None for all) are linked back
+    # as collection instances. Linked data is read-only, so tiles always use keyframes (no analytic animation).
+    "use_tiles": False,
+    "tile_size": 50.0,
+    "tile_dir": None, # Default: <dest_collection>_tiles next to .blend file.
+    "link_generated_tiles": True,
+    "link_region": None,
+    "incremental": True}
 
-def main():
+def main(seed=0, shard_index=0, n_shards=1, config=None):
     """
         Given collection of curve objects, this script for each curve,
         creates randomized instances and animates their growth.
+        Randomness is determined by seed, guide name and copy index only.
+        Work can be split across processes: shard_index/n_shards select every n_shards-th guide
+        (every n_shards-th tile with use_tiles).
+        Generated objects are tagged with guide and parameter hash. With incremental, only guides whose
+        data or parameters changed are regenerated, otherwise all previous outputs are replaced.
+        With use_tiles, copies are generated tile by tile into tile libraries (see ink_nature.tiles),
+        only changed tiles are regenerated and tiles are linked back into destination collection.
+        config overrides entries of CONFIG.
+        Returns names of destination collections.
     """
-    # Apply on all objects in collection.
-    n_copies_per_base_curve = 30
-    translation_factor = 5
-    scale_factor = 3
-    frame_start = 0
-    frame_end = 200
-    curve_thickness_min_max = [0.01, 0.1]
-    target_collection = "grass1_guides"
-    dest_collection = "grass1_generated"
-    start_thickness = 0.01
-    start_growth = 0.1
-    for base_curve in bpy.data.collections[target_collection].all_objects:
-        for i in range(n_copies_per_base_curve):
-            # Create a copy.
-            curve_cpy = copy_obj(base_curve, dest_collection)
-            # Add bevel.
-            curve_cpy.data.bevel_depth = mathutils.noise.random() * 0.01
-            # Random rotation around Z axis.
-            curve_cpy.rotation_euler[2] = mathutils.noise.random() * 360.0
-            # Random translation in XY around base curve.
-            # NOTE: base curve must not have translation applied!
-            curve_cpy.location[0] = base_curve.location[0] + mathutils.noise.random() * translation_factor - translation_factor / 2
-            curve_cpy.location[1] = base_curve.location[1] + mathutils.noise.random() * translation_factor - translation_factor / 2
-            # Random scaling (XYZ).
-            rand_scale = mathutils.noise.random() * scale_factor
-            curve_cpy.scale[0] = rand_scale
-            curve_cpy.scale[1] = rand_scale
-            curve_cpy.scale[2] = rand_scale
-            # Animate curve growth.
-            growth_factor_end = 1.0
-            animate_curve_growth(curve_cpy, frame_start, frame_end, growth_factor_end, start_growth)
-            # Animate curve bevel.
-            animate_curve_thickness(curve_cpy, frame_start, frame_end, curve_thickness_min_max[0], curve_thickness_min_max[1], start_thickness)
-            # Interpolation.
-            set_animation_fcurve(curve_cpy)
-            # Add cube at the end.
-            """
-            curve_type = curve_cpy.data.splines[0].type
-            if curve_type == "BEZIER":
-                points = curve_cpy.data.splines[0].bezier_points
-                bpy.ops.mesh.primitive_cube_add(size=0.0, enter_editmode=False, align='WORLD', location=points[-1].co, scale=(1, 1, 1))
-                cube = bpy.context.selected_objects[0]
-                cube.scale = mathutils.Vector((0, 0, 0))
-                cube.keyframe_insert(data_path="scale", frame=frame_start)
-                cube.keyframe_insert(data_path="scale", frame=frame_end-1)
-                cube.scale = mathutils.Vector((rand_scale, rand_scale, rand_scale))
-                cube.keyframe_insert(data_path="scale", frame=frame_end)
-            """
+    return generate_curve_copies(COPY_VARIANT, job_config(CONFIG, config), seed, shard_index, n_shards)
 
 #
 # Script entry point.
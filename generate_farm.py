@@ -0,0 +1,157 @@
+
+# Blender 3.5.1.
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import uuid
+
+# Launcher runs with plain Python, worker and merge steps run inside `blender -b --python`.
+try:
+    import bpy
+except ImportError:
+    bpy = None
+
+# ink_nature/ is next to this script (imported by worker and merge steps only, it requires bpy).
+script_dir = os.path.dirname(os.path.abspath(__file__))
+if script_dir not in sys.path:
+    sys.path.append(script_dir)
+
+def script_args():
+    # Blender passes arguments after "--" to the script untouched.
+    argv = sys.argv
+    return argv[argv.index("--") + 1:] if "--" in argv else argv[1:]
+
+def load_script(script_path):
+    """
+        Import generator script as module without running its entry point.
+    """
+    import importlib.util
+    spec = importlib.util.spec_from_file_location(os.path.splitext(os.path.basename(script_path))[0], script_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def removed_path(shard_path):
+    # Names of outputs the worker removed (stale or of deleted guides), next to the shard .blend.
+    return os.path.splitext(shard_path)[0] + "_removed.json"
+
+def run_worker(script_path, seed, shard_index, n_shards, output_path):
+    """
+        Run one shard of generator and write outputs created by this run to output .blend, with the
+        destination collections holding them (and all dependencies). Outputs already in the source file
+        are not written, names of outputs removed by the run are stored next to the shard for merge_shards().
+        Generators use counter-based random numbers, so output does not depend on n_shards.
+    """
+    module = load_script(script_path)
+    from ink_nature import blender
+    run = uuid.uuid4().hex
+    blender.GENERATOR_RUN = run
+    existing = [obj.name for obj in bpy.data.objects if obj.get("generator") is not None]
+    dest_collections = module.main(seed=seed, shard_index=shard_index, n_shards=n_shards)
+    # Removed, or replaced by an output of the same name.
+    removed = [name for name in existing if name not in bpy.data.objects or bpy.data.objects[name].get("generator_run") == run]
+    shard = "{}/{}".format(shard_index, n_shards)
+    datablocks = set()
+    for name in dest_collections:
+        if name not in bpy.data.collections:
+            continue
+        collection = bpy.data.collections[name]
+        for obj in list(collection.objects):
+            if obj.get("generator_run") != run or obj.get("generator_shard") != shard:
+                collection.objects.unlink(obj)
+            else:
+                del obj["generator_run"]
+        datablocks.add(collection)
+    bpy.data.libraries.write(output_path, datablocks, fake_user=True)
+    with open(removed_path(output_path), "w") as f:
+        json.dump({"removed": removed}, f)
+
+def merge_shards(shard_paths, output_path):
+    """
+        Remove outputs which workers removed (regenerated or of deleted guides) from current file,
+        then append destination collections of all shards in one bulk step, move their objects into
+        collections of the same name in current file, register analytic animation and save it.
+    """
+    from ink_nature.blender import register_analytic_animation, remove_generated
+    removed = set()
+    for shard_path in shard_paths:
+        with open(removed_path(shard_path)) as f:
+            removed.update(json.load(f)["removed"])
+    # Removed before appending, so appended outputs keep their names.
+    remove_generated([bpy.data.objects[name] for name in removed if name in bpy.data.objects and bpy.data.objects[name].get("generator") is not None])
+    for shard_path in shard_paths:
+        with bpy.data.libraries.load(shard_path, link=False) as (data_from, data_to):
+            data_to.collections = list(data_from.collections)
+        for name, shard_collection in zip(data_from.collections, data_to.collections):
+            if shard_collection is None:
+                continue
+            if name not in bpy.data.collections or bpy.data.collections[name] == shard_collection:
+                # Name was free, keep appended collection as it is.
+                if shard_collection.name not in bpy.context.scene.collection.children:
+                    bpy.context.scene.collection.children.link(shard_collection)
+                shard_collection.use_fake_user = False
+                continue
+            collection = bpy.data.collections[name]
+            for obj in shard_collection.objects:
+                collection.objects.link(obj)
+            bpy.data.collections.remove(shard_collection)
+    # Shards hold destination collections only: analytic animation of appended copies needs handler and its text block.
+    register_analytic_animation()
+    bpy.ops.wm.save_as_mainfile(filepath=output_path)
+
+def launch(blender, blend_path, script_path, seed, n_workers, shard_dir, output_path):
+    """
+        Start n_workers background Blender processes on blend_path, one shard each,
+        then merge all shards into output_path.
+    """
+    os.makedirs(shard_dir, exist_ok=True)
+    this_script = os.path.abspath(__file__)
+    shard_paths = [os.path.join(shard_dir, "shard_{:03d}.blend".format(i)) for i in range(n_workers)]
+    workers = []
+    for shard_index, shard_path in enumerate(shard_paths):
+        workers.append(subprocess.Popen([
+            blender, "-b", blend_path, "--python-exit-code", "1", "--python", this_script, "--",
+            "worker", script_path, str(seed), str(shard_index), str(n_workers), shard_path]))
+    failed = [i for i, worker in enumerate(workers) if worker.wait() != 0]
+    if failed:
+        sys.exit("Workers failed: {}".format(failed))
+    merge = subprocess.run([blender, "-b", blend_path, "--python-exit-code", "1", "--python", this_script, "--", "merge", output_path] + shard_paths)
+    if merge.returncode != 0:
+        sys.exit("Merge failed.")
+
+def main():
+    """
+        Split generation of a script (its guide objects or strokes) across N `blender -b` workers.
+        Each worker writes its new outputs to a shard .blend, outputs removed by workers are dropped from
+        output file and shards are then appended into it in one step.
+        Usage: python generate_farm.py --blender blender --blend scene.blend --script procedural_spline_polygons.py --workers 8
+    """
+    args = script_args()
+    if args and args[0] == "worker":
+        script_path, seed, shard_index, n_shards, output_path = args[1:6]
+        run_worker(script_path, int(seed), int(shard_index), int(n_shards), output_path)
+        return
+    if args and args[0] == "merge":
+        merge_shards(args[2:], args[1])
+        return
+    parser = argparse.ArgumentParser(description="Run generator script on multiple Blender processes.")
+    parser.add_argument("--blender", default="blender", help="Blender executable.")
+    parser.add_argument("--blend", required=True, help="Source .blend with guide collections.")
+    parser.add_argument("--script", required=True, help="Generator script, e.g. copy_animate_curve_bevel.py.")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed passed to generator main().")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Number of worker processes.")
+    parser.add_argument("--shard-dir", default=None, help="Directory for shard files (default: <blend>_shards).")
+    parser.add_argument("--output", default=None, help="Merged output .blend (default: overwrite --blend).")
+    parsed = parser.parse_args(args)
+    blend_path = os.path.abspath(parsed.blend)
+    shard_dir = parsed.shard_dir or os.path.splitext(blend_path)[0] + "_shards"
+    launch(parsed.blender, blend_path, os.path.abspath(parsed.script), parsed.seed, parsed.workers, os.path.abspath(shard_dir), os.path.abspath(parsed.output or blend_path))
+
+#
+# Script entry point.
+#
+if __name__ == "__main__":
+    main()
@@ -1,106 +1,153 @@
 
 # Blender 3.5.1.
 
+import os
+import sys
 import bpy
-import mathutils
-import bmesh
+import numpy as np
 
-# Interpolate [a,b] using factor t.
-def lerp(t, a, b):
-    return (1.0 - t) * a + t * b
+# Shared generator package ink_nature/ is next to this script (or next to the .blend when run from text editor).
+for path in (os.path.dirname(os.path.abspath(__file__)), bpy.path.abspath("//")):
+    if path and path not in sys.path:
+        sys.path.append(path)
 
-# https://blender.stackexchange.com/questions/220072/check-using-name-if-a-collection-exists-in-blend-is-linked-to-scene
-def create_collection_if_not_exists(collection_name):
-    if collection_name not in bpy.data.collections:
-        new_collection = bpy.data.collections.new(collection_name)
-        bpy.context.scene.collection.children.link(new_collection) #Creates a new collection
+from ink_nature.core import ANALYTIC_EASING, animation_parameters, copy_lod, hash_arrays, lerp, perturbed_copies
+from ink_nature.cache import cache_load, cache_store
+from ink_nature.jobs import job_config
+from ink_nature.profiling import finish_profile, stage, start_profile
+from ink_nature.blender import (apply_curve_lod, camera_view, copy_obj, create_empty_marker, default_cache_dir, find_generated, guide_hash, is_up_to_date,
+    read_curve_points, register_analytic_animation, remove_generated, tag_generated, world_bound_sphere, write_animation, write_curve_points)
 
-def add_object_to_collection(base_object, collection_name="collection"):
-    create_collection_if_not_exists(collection_name)
-    bpy.data.collections[collection_name].objects.link(base_object)
+# Default parameters of main(), every job can override them (see run_jobs.py).
+CONFIG = {
+    "src_collection": "pillar_grow_curve_guide",
+    "dest_collection": "pillar_grow_curve_generated",
+    "start_thickness": 0.01,
+    "start_growth": 0.1,
+    "growth_factor_end": 1.0,
+    "n_copies_per_base_curve": 10,
+    "frame_start": 0,
+    "frame_end": 275,
+    "curve_thickness_min_max": [0.1, 0.2],
+    "perturb_settings": {"perturb_scale": 2.0, "perturb_strength": 3.0, "n_octaves": 1, "amplitude_scale": 2.0, "frequency_scale": 2.0},
+    "use_cache": True,
+    "cache_dir": None, # Default: generator_cache next to .blend file.
+    "cache_max_bytes": 2 * 1024**3,
+    # Store growth and thickness as per-copy parameters evaluated by one frame change handler instead of actions.
+    "use_analytic_animation": False,
+    # Camera culling and level of detail: guides outside the scene camera view over [frame_start, frame_end]
+    # are skipped, guides smaller than lod_full_detail_pixels on screen get fewer copies with lower curve resolution.
+    # lod_margin (world units) is added to guide bounds for perturbation and thickness.
+    "use_camera_lod": False,
+    "lod_full_detail_pixels": 64.0,
+    "lod_min_fraction": 0.1,
+    "lod_margin": 3.0,
+    "incremental": True}
 
-def copy_obj(obj, collection_name):
-    obj_cpy = obj.copy()
-    obj_cpy.data = obj.data.copy()
-    obj_cpy.animation_data_clear()
-    if collection_name == None:
-        bpy.context.collection.objects.link(obj_cpy)
-    else:
-        add_object_to_collection(obj_cpy, collection_name)
-    return obj_cpy
+def main(seed=0, shard_index=0, n_shards=1, config=None):
+    """
+        Given collection of curve objects, this script for each curve,
+        creates perturbed copies around it and animates their growth and thickness.
+        Randomness is determined by seed, guide name and copy index only.
+        Work can be split across processes: shard_index/n_shards select every n_shards-th guide.
+        With use_cache, perturbed points are stored on disk keyed by guide points, transform,
+        parameters and seed, and unchanged guides are rebuilt from the cache without noise evaluation.
+        Generated objects are tagged with guide and parameter hash. With incremental, only guides whose
+        data or parameters changed are regenerated, otherwise all previous outputs are replaced.
+        config overrides entries of CONFIG.
+        Returns names of destination collections.
+    """
+    config = job_config(CONFIG, config)
+    src_collection = config["src_collection"]
+    dest_collection = config["dest_collection"]
+    start_thickness = config["start_thickness"]
+    start_growth = config["start_growth"]
+    growth_factor_end = config["growth_factor_end"]
+    n_copies_per_base_curve = config["n_copies_per_base_curve"]
+    frame_start = config["frame_start"]
+    frame_end = config["frame_end"]
+    curve_thickness_min_max = config["curve_thickness_min_max"]
+    perturb_settings = config["perturb_settings"]
+    use_cache = config["use_cache"]
+    cache_dir = config["cache_dir"] or default_cache_dir()
+    cache_max_bytes = config["cache_max_bytes"]
+    use_analytic_animation = config["use_analytic_animation"]
+    use_camera_lod = config["use_camera_lod"]
+    lod_full_detail_pixels = config["lod_full_detail_pixels"]
+    lod_min_fraction = config["lod_min_fraction"]
+    lod_margin = config["lod_margin"]
+    incremental = config["incremental"]
+    generator = "grow_around_curve"
+    shard = "{}/{}".format(shard_index, n_shards)
+    # Per-stage timings and counters, enabled by INK_NATURE_PROFILE=<trace.json>: summary table and Chrome trace.
+    profile_path = os.environ.get("INK_NATURE_PROFILE")
+    start_profile(profile_path, generator)
+    parameters = (n_copies_per_base_curve, frame_start, frame_end, curve_thickness_min_max, start_thickness, start_growth, growth_factor_end, perturb_settings, use_analytic_animation)
+    view = camera_view(bpy.context.scene, frame_start, frame_end) if use_camera_lod else None
+    if view is not None:
+        # Outputs depend on camera too.
+        parameters += (lod_full_detail_pixels, lod_min_fraction, lod_margin, view["key"])
+    # Find stale outputs (changed or removed guides) and remove them before generating.
+    generated = find_generated(dest_collection, generator)
+    stale = []
+    to_generate = []
+    for guide_index, base_curve in enumerate(bpy.data.collections[src_collection].all_objects):
+        previous = generated.pop(base_curve.name, [])
+        if guide_index % n_shards != shard_index:
+            continue
+        param_hash = guide_hash(base_curve, generator, seed, parameters)
+        if incremental and is_up_to_date(previous, param_hash):
+            continue
+        stale += previous
+        to_generate.append((base_curve, param_hash))
+    # Outputs of removed guides are dropped by first shard only.
+    if shard_index == 0:
+        for objects in generated.values():
+            stale += objects
+    remove_generated(stale)
+    for base_curve, param_hash in to_generate:
+        with stage("guide", guide=base_curve.name, items=n_copies_per_base_curve):
+            # All copies share guide bounds, level of detail thins them out (copy_index selects kept copies).
+            copy_index = np.arange(n_copies_per_base_curve)
+            fractions = np.ones(n_copies_per_base_curve)
+            if view is not None:
+                center, radius = world_bound_sphere(base_curve)
+                fractions, keep = copy_lod(seed, base_curve.name, np.tile(center, (n_copies_per_base_curve, 1)), radius + lod_margin, view, lod_full_detail_pixels, lod_min_fraction)
+                copy_index = np.flatnonzero(keep)
+                if len(copy_index) == 0:
+                    tag_generated(create_empty_marker(base_curve.name, dest_collection), generator, base_curve.name, shard, param_hash)
+                    continue
+            copies = None
+            guide_points = read_curve_points(base_curve)
+            if use_cache:
+                cache_key = hash_arrays(
+                    "grow_around_curve", base_curve.name, seed, n_copies_per_base_curve, perturb_settings,
+                    np.array(base_curve.matrix_world), *[guide_points[name] for name in sorted(guide_points)],
+                    *([copy_index] if view is not None else []))
+                copies = cache_load(cache_dir, cache_key)
+            if copies is None:
+                copies = perturbed_copies(guide_points, base_curve.name, n_copies_per_base_curve, perturb_settings, seed, copy_index)
+                if use_cache:
+                    cache_store(cache_dir, cache_key, copies, cache_max_bytes)
+            # Animation parameters of kept copies, keyframes were BEZIER (ease in and out).
+            easing = ANALYTIC_EASING['BEZIER']
+            growth = animation_parameters(frame_start, frame_end, start_growth, np.full(len(copy_index), growth_factor_end), easing)
+            thickness = animation_parameters(frame_start, frame_end, start_thickness, lerp(copies["rand_thickness"], curve_thickness_min_max[0], curve_thickness_min_max[1]), easing)
+            for j, i in enumerate(copy_index):
+                # Create a copy.
+                curve_cpy = copy_obj(base_curve, dest_collection)
+                tag_generated(curve_cpy, generator, base_curve.name, shard, param_hash)
+                # Perturb.
+                write_curve_points(curve_cpy, {name: copies[name][j] for name in ("bezier_co", "handle_left", "handle_right", "points_co")})
+                # Animate curve growth and thickness.
+                curve_cpy.data.bevel_factor_start = 0
+                write_animation(curve_cpy.data, {"bevel_factor_end": growth[j], "bevel_depth": thickness[j]}, analytic=use_analytic_animation)
+                if view is not None:
+                    apply_curve_lod(curve_cpy.data, fractions[i])
 
-def perturb_curve(curve_obj, perturb_scale=1.0, perturb_strength=1.0, n_octaves=1, amplitude_scale=1.0, frequency_scale=1.0):
-    curve_type = curve_obj.data.splines[0].type
-    points = []
-    if curve_type == "BEZIER":
-        points = curve_obj.data.splines[0].bezier_points
-    if curve_type == "POLY" or curve_type == "NURBS":
-        points = curve_obj.data.splines[0].points
-    for point in points:
-        point_co = mathutils.Vector((point.co[0], point.co[1], point.co[2]))       
-        trans_vec = mathutils.noise.turbulence_vector(
-            point_co * perturb_scale * mathutils.noise.random(), 
-            n_octaves,
-            False, #hard
-            noise_basis='PERLIN_ORIGINAL',
-            amplitude_scale=amplitude_scale,
-            frequency_scale=frequency_scale) * perturb_strength
-        new_point_co = point_co + trans_vec
-        if curve_type == "BEZIER":
-            point.co = (new_point_co[0], new_point_co[1], new_point_co[2])
-        if curve_type == "POLY" or curve_type == "NURBS":
-            point.co = (new_point_co[0], new_point_co[1], new_point_co[2], point.co[3]) # Note: https://blender.stackexchange.com/questions/220812/what-is-the-4th-coordinate-of-spline-points
-    return curve_obj
-
-def animate_curve_growth(curve, frame_start, frame_end, growth_factor_end, start_growth):
-    curve.data.bevel_factor_end = start_growth
-    curve.data.bevel_factor_start = 0
-    curve.data.keyframe_insert(data_path="bevel_factor_end", frame=frame_start)
-    curve.data.keyframe_insert(data_path="bevel_factor_end", frame=frame_start)
-    curve.data.bevel_factor_end = growth_factor_end
-    curve.data.keyframe_insert(data_path="bevel_factor_end", frame=frame_end)
-
-def animate_curve_thickness(curve, frame_start, frame_end, thickness_min, thickness_max, start_thickness=0.0):
-    curve.data.bevel_depth = start_thickness
-    curve.data.keyframe_insert(data_path="bevel_depth", frame=frame_start)
-    curve.data.bevel_depth = lerp(mathutils.noise.random(), thickness_min, thickness_max)
-    curve.data.keyframe_insert(data_path="bevel_depth", frame=frame_end)
-
-# https://behreajj.medium.com/scripting-curves-in-blender-with-python-c487097efd13
-def set_animation_fcurve(base_object, option='LINEAR'):
-    fcurves = base_object.data.animation_data.action.fcurves
-    for fcurve in fcurves:
-        for kf in fcurve.keyframe_points:
-            # Options: ['CONSTANT', 'LINEAR', 'BEZIER', 'SINE',
-            # 'QUAD', 'CUBIC', 'QUART', 'QUINT', 'EXPO', 'CIRC',
-            # 'BACK', 'BOUNCE', 'ELASTIC']
-            kf.interpolation = option
-            # Options: ['AUTO', 'EASE_IN', 'EASE_OUT', 'EASE_IN_OUT']
-            kf.easing = 'AUTO'
-
-def main():
-    src_collection = "pillar_grow_curve_guide"
-    dest_collection = "pillar_grow_curve_generated"
-    start_thickness = 0.01
-    start_growth = 0.1
-    n_copies_per_base_curve = 10
-    frame_start = 0
-    frame_end = 275
-    curve_thickness_min_max = [0.1, 0.2]
-    start_thickness = 0.01
-    for base_curve in bpy.data.collections[src_collection].all_objects:
-        for i in range(n_copies_per_base_curve):
-            # Create a copy.
-            curve_cpy = copy_obj(base_curve, dest_collection)
-            # Add bevel.
-            curve_cpy.data.bevel_depth = mathutils.noise.random() * 0.2
-            # Perturb.
-            curve_cpy = perturb_curve(curve_cpy, perturb_scale=2.0, perturb_strength=3.0, n_octaves=1, amplitude_scale=2.0, frequency_scale=2.0)
-            # Animate curve growth.
-            growth_factor_end = 1.0
-            animate_curve_growth(curve_cpy, frame_start, frame_end, growth_factor_end, start_growth)
-            # Animate curve thickness.
-            animate_curve_thickness(curve_cpy, frame_start, frame_end, curve_thickness_min_max[0], curve_thickness_min_max[1], start_thickness=start_thickness)
+    register_analytic_animation()
+    finish_profile(profile_path)
+    return [dest_collection]
 
 #
 # Script entry point.
@@ -0,0 +1,8 @@
+
+# Shared stroke generation package used by the generator scripts.
+#   core: NumPy-only stroke generation (runs on plain Python, no Blender needed).
+#   cache: on-disk .npz cache of generated arrays.
+#   tiles: tile grouping and index of tile libraries for tiled streaming generation.
+#   jobs: declarative job files and CONFIG overrides of generator scripts.
+#   blender: thin adapter moving arrays in and out of Blender data (requires bpy).
+#   copies: shared copy generator of the bevel and extrude copy scripts (requires bpy).
@@ -0,0 +1,686 @@
+
+# Blender 3.5.1.
+
+# Thin Blender adapter of the stroke generation core: moves arrays in and out of Blender data
+# in bulk (foreach_get/foreach_set), creates objects, keyframes and tags of generated objects.
+
+import contextlib
+import os
+import tempfile
+import bpy
+import numpy as np
+
+from .core import ANALYTIC_EASING, evaluate_analytic_animation, hash_arrays, lod_resolution, perturb_curve_points, transform_points
+from .profiling import count, profiled, stage
+from .tiles import group_by_tile, read_tile_record, remove_tile, tile_name, tile_names, update_tile_index, write_tile_record
+
+# Guide data read while shared_lookups() is active (run_jobs.py), keyed by (data pointer, data name),
+# so jobs of one session reading the same guides or meshes read them from Blender only once.
+SHARED_LOOKUPS = None
+
+@contextlib.contextmanager
+def shared_lookups():
+    global SHARED_LOOKUPS
+    outer = SHARED_LOOKUPS
+    SHARED_LOOKUPS = {} if outer is None else outer
+    try:
+        yield SHARED_LOOKUPS
+    finally:
+        SHARED_LOOKUPS = outer
+
+def shared_lookup(kind, data, read):
+    # Copy of cached arrays, callers may modify them in place.
+    if SHARED_LOOKUPS is None:
+        return read()
+    key = (kind, data.as_pointer(), data.name)
+    if key in SHARED_LOOKUPS:
+        count("shared_hits")
+    else:
+        SHARED_LOOKUPS[key] = read()
+    return {name: array.copy() for name, array in SHARED_LOOKUPS[key].items()}
+
+def forget_shared(data_blocks):
+    if SHARED_LOOKUPS is None:
+        return
+    pointers = {data.as_pointer() for data in data_blocks}
+    for key in [key for key in SHARED_LOOKUPS if key[1] in pointers]:
+        del SHARED_LOOKUPS[key]
+
+# https://blender.stackexchange.com/questions/220072/check-using-name-if-a-collection-exists-in-blend-is-linked-to-scene
+def create_collection_if_not_exists(collection_name):
+    if collection_name not in bpy.data.collections:
+        new_collection = bpy.data.collections.new(collection_name)
+        bpy.context.scene.collection.children.link(new_collection) #Creates a new collection
+
+def add_object_to_collection(base_object, collection_name="collection"):
+    create_collection_if_not_exists(collection_name)
+    bpy.data.collections[collection_name].objects.link(base_object)
+    count("collection_links")
+
+@profiled()
+def copy_obj(obj, collection_name):
+    obj_cpy = obj.copy()
+    obj_cpy.data = obj.data.copy()
+    obj_cpy.animation_data_clear()
+    count("objects_created")
+    count("datablocks_copied", 2)
+    if collection_name == None:
+        bpy.context.collection.objects.link(obj_cpy)
+    else:
+        add_object_to_collection(obj_cpy, collection_name)
+    return obj_cpy
+
+@profiled()
+def read_curve_points(curve_obj):
+    """
+        Read control points of all curve splines into one buffer per spline type.
+        Returns dict: bezier co, handle_left, handle_right (Nb, 3) and POLY/NURBS points co (Np, 4).
+    """
+    return shared_lookup("curve_points", curve_obj.data, lambda: read_splines(curve_obj.data.splines))
+
+def read_splines(splines):
+    bezier_points = [spline.bezier_points for spline in splines if spline.type == "BEZIER"]
+    points = [spline.points for spline in splines if spline.type == "POLY" or spline.type == "NURBS"]
+    bezier_offsets = np.concatenate(([0], np.cumsum([len(p) for p in bezier_points], dtype=np.int64)))
+    points_offsets = np.concatenate(([0], np.cumsum([len(p) for p in points], dtype=np.int64)))
+    curve_points = {
+        "bezier_co": np.empty((bezier_offsets[-1], 3), dtype=np.float32),
+        "handle_left": np.empty((bezier_offsets[-1], 3), dtype=np.float32),
+        "handle_right": np.empty((bezier_offsets[-1], 3), dtype=np.float32),
+        "points_co": np.empty((points_offsets[-1], 4), dtype=np.float32)} # Note: https://blender.stackexchange.com/questions/220812/what-is-the-4th-coordinate-of-spline-points
+    for i, spline_points in enumerate(bezier_points):
+        s = slice(bezier_offsets[i], bezier_offsets[i + 1])
+        spline_points.foreach_get("co", curve_points["bezier_co"][s].ravel())
+        spline_points.foreach_get("handle_left", curve_points["handle_left"][s].ravel())
+        spline_points.foreach_get("handle_right", curve_points["handle_right"][s].ravel())
+    for i, spline_points in enumerate(points):
+        s = slice(points_offsets[i], points_offsets[i + 1])
+        spline_points.foreach_get("co", curve_points["points_co"][s].ravel())
+    count("rna.foreach_get", 3 * len(bezier_points) + len(points))
+    return curve_points
+
+@profiled()
+def write_curve_points(curve_obj, curve_points):
+    """
+        Write buffers from read_curve_points() back to splines of curve with the same topology.
+    """
+    forget_shared([curve_obj.data])
+    splines = curve_obj.data.splines
+    bezier_points = [spline.bezier_points for spline in splines if spline.type == "BEZIER"]
+    points = [spline.points for spline in splines if spline.type == "POLY" or spline.type == "NURBS"]
+    bezier_offsets = np.concatenate(([0], np.cumsum([len(p) for p in bezier_points], dtype=np.int64)))
+    points_offsets = np.concatenate(([0], np.cumsum([len(p) for p in points], dtype=np.int64)))
+    for i, spline_points in enumerate(bezier_points):
+        s = slice(bezier_offsets[i], bezier_offsets[i + 1])
+        spline_points.foreach_set("co", curve_points["bezier_co"][s].ravel())
+        spline_points.foreach_set("handle_left", curve_points["handle_left"][s].ravel())
+        spline_points.foreach_set("handle_right", curve_points["handle_right"][s].ravel())
+    for i, spline_points in enumerate(points):
+        s = slice(points_offsets[i], points_offsets[i + 1])
+        spline_points.foreach_set("co", curve_points["points_co"][s].ravel())
+    curve_obj.data.update_tag()
+    count("rna.foreach_set", 3 * len(bezier_points) + len(points))
+
+def perturb_curve(curve_obj, perturb_scale=1.0, perturb_strength=1.0, n_octaves=1, amplitude_scale=1.0, frequency_scale=1.0, seed=0, key=("perturb",), counters=None):
+    """
+        Displace control points of all curve splines with turbulence noise.
+        Points of every spline are read into one buffer, displaced as a batch and written back.
+    """
+    curve_points = read_curve_points(curve_obj)
+    write_curve_points(curve_obj, perturb_curve_points(curve_points, perturb_scale, perturb_strength, n_octaves, amplitude_scale, frequency_scale, seed, key, counters))
+    return curve_obj
+
+@profiled()
+def read_mesh_arrays(mesh):
+    """
+        Read mesh data used by the core with foreach_get. Returns dict: co (V, 3),
+        edge_vertices (E, 2), is_seam (E,), loop_vertices, loop_edges (L,),
+        loop_start, loop_total, material_index (P,), normals and centers (P, 3).
+    """
+    return shared_lookup("mesh_arrays", mesh, lambda: read_mesh_data(mesh))
+
+def read_mesh_data(mesh):
+    # Buffers match Blender storage (int32, float32), otherwise foreach_get falls back to per-item access.
+    # Widened to int64/float64 for the core afterwards.
+    n_edges = len(mesh.edges)
+    n_loops = len(mesh.loops)
+    n_polygons = len(mesh.polygons)
+    buffers = {
+        "co": np.empty((len(mesh.vertices), 3), dtype=np.float32),
+        "edge_vertices": np.empty((n_edges, 2), dtype=np.int32),
+        "is_seam": np.empty(n_edges, dtype=bool),
+        "loop_vertices": np.empty(n_loops, dtype=np.int32),
+        "loop_edges": np.empty(n_loops, dtype=np.int32),
+        "loop_start": np.empty(n_polygons, dtype=np.int32),
+        "loop_total": np.empty(n_polygons, dtype=np.int32),
+        "material_index": np.empty(n_polygons, dtype=np.int32),
+        "normals": np.empty((n_polygons, 3), dtype=np.float32),
+        "centers": np.empty((n_polygons, 3), dtype=np.float32)}
+    mesh.vertices.foreach_get("co", buffers["co"].ravel())
+    mesh.edges.foreach_get("vertices", buffers["edge_vertices"].ravel())
+    mesh.edges.foreach_get("use_seam", buffers["is_seam"])
+    mesh.loops.foreach_get("vertex_index", buffers["loop_vertices"])
+    mesh.loops.foreach_get("edge_index", buffers["loop_edges"])
+    mesh.polygons.foreach_get("loop_start", buffers["loop_start"])
+    mesh.polygons.foreach_get("loop_total", buffers["loop_total"])
+    mesh.polygons.foreach_get("material_index", buffers["material_index"])
+    mesh.polygons.foreach_get("normal", buffers["normals"].ravel())
+    mesh.polygons.foreach_get("center", buffers["centers"].ravel())
+    count("rna.foreach_get", len(buffers))
+    widen = {np.dtype(np.float32): np.float64, np.dtype(np.int32): np.int64}
+    return {name: buffer.astype(widen.get(buffer.dtype, buffer.dtype)) for name, buffer in buffers.items()}
+
+@profiled()
+def fill_curve_splines(curve, points, counts, radius, cyclic=False):
+    """
+        Replace splines of curve with POLY splines, one per count, filled with foreach_set.
+        Per-spline thickness is given by point radius (scaled by bevel_depth).
+    """
+    curve.splines.clear()
+    co = np.ones((len(points), 4), dtype=np.float32) # Note: https://blender.stackexchange.com/questions/220812/what-is-the-4th-coordinate-of-spline-points
+    co[:, :3] = points
+    point_radius = np.repeat(np.asarray(radius, dtype=np.float32), counts)
+    offsets = np.concatenate(([0], np.cumsum(counts)))
+    for i in range(len(counts)):
+        spline = curve.splines.new('POLY')
+        spline.points.add(int(counts[i]) - 1)
+        s = slice(offsets[i], offsets[i + 1])
+        spline.points.foreach_set("co", co[s].ravel())
+        spline.points.foreach_set("radius", point_radius[s])
+        spline.use_cyclic_u = cyclic
+    count("splines_created", len(counts))
+    count("rna.foreach_set", 2 * len(counts))
+    return curve
+
+@profiled()
+def create_curve_from_splines(name, points, counts, radius, cyclic=True, bevel_depth=1.0, collection_name=None):
+    """
+        Create one POLY curve object holding a spline per count, filled with foreach_set.
+        Per-spline thickness is given by point radius (scaled by bevel_depth).
+    """
+    curve = bpy.data.curves.new(name, type='CURVE')
+    curve.dimensions = '3D'
+    curve.bevel_depth = bevel_depth
+    fill_curve_splines(curve, points, counts, radius, cyclic)
+    curve_obj = bpy.data.objects.new(name, curve)
+    count("objects_created")
+    if collection_name == None:
+        bpy.context.collection.objects.link(curve_obj)
+    else:
+        add_object_to_collection(curve_obj, collection_name)
+    return curve_obj
+
+@profiled()
+def convert_curve_to_mesh(curve_obj):
+    """
+        Replace curve object with mesh of its evaluated (beveled) geometry, without operators.
+    """
+    depsgraph = bpy.context.evaluated_depsgraph_get()
+    mesh = bpy.data.meshes.new_from_object(curve_obj.evaluated_get(depsgraph))
+    mesh_obj = bpy.data.objects.new(curve_obj.name, mesh)
+    mesh_obj.matrix_world = curve_obj.matrix_world
+    for collection in curve_obj.users_collection:
+        collection.objects.link(mesh_obj)
+    curve = curve_obj.data
+    forget_shared([curve])
+    bpy.data.objects.remove(curve_obj)
+    bpy.data.curves.remove(curve)
+    count("objects_created")
+    count("datablocks_removed", 2)
+    return mesh_obj
+
+@profiled()
+def create_instance_points(name, locations, attributes, materials, collection_name):
+    """
+        Mesh object with one vertex per instance and given per-vertex attributes.
+        attributes: {name: (N,) or (N, 3) values}
+    """
+    locations = np.asarray(locations, dtype=np.float32)
+    mesh = bpy.data.meshes.new(name)
+    mesh.vertices.add(len(locations))
+    mesh.vertices.foreach_set("co", locations.ravel())
+    for attribute_name, values in attributes.items():
+        values = np.asarray(values, dtype=np.float32)
+        if values.ndim == 2:
+            attribute = mesh.attributes.new(attribute_name, 'FLOAT_VECTOR', 'POINT')
+            attribute.data.foreach_set("vector", values.ravel())
+        else:
+            attribute = mesh.attributes.new(attribute_name, 'FLOAT', 'POINT')
+            attribute.data.foreach_set("value", values)
+    for material in materials:
+        mesh.materials.append(material)
+    mesh.update()
+    obj = bpy.data.objects.new(name, mesh)
+    count("objects_created")
+    count("rna.foreach_set", 1 + len(attributes))
+    if collection_name == None:
+        bpy.context.collection.objects.link(obj)
+    else:
+        add_object_to_collection(obj, collection_name)
+    return obj
+
+# Geometry Nodes building blocks for instancing node groups.
+def named_attribute(tree, name, data_type):
+    node = tree.nodes.new('GeometryNodeInputNamedAttribute')
+    node.data_type = data_type
+    node.inputs["Name"].default_value = name
+    return next(socket for socket in node.outputs if socket.enabled)
+
+def math_node(tree, operation, a, b):
+    node = tree.nodes.new('ShaderNodeMath')
+    node.operation = operation
+    tree.links.new(a, node.inputs[0])
+    tree.links.new(b, node.inputs[1])
+    return node.outputs["Value"]
+
+def frame_lerp(tree, group_in, frame, value_start, value_end):
+    """
+        Linear interpolation of value over [Frame Start, Frame End], clamped outside the range.
+        Matches LINEAR keyframes at both ends of the range.
+    """
+    node = tree.nodes.new('ShaderNodeMapRange')
+    node.clamp = True
+    tree.links.new(frame, node.inputs["Value"])
+    tree.links.new(group_in.outputs["Frame Start"], node.inputs["From Min"])
+    tree.links.new(group_in.outputs["Frame End"], node.inputs["From Max"])
+    tree.links.new(value_start, node.inputs["To Min"])
+    tree.links.new(value_end, node.inputs["To Max"])
+    return node.outputs["Result"]
+
+# Keyframe enum values as stored by foreach_set().
+# https://docs.blender.org/api/current/bpy.types.Keyframe.html
+KEYFRAME_INTERPOLATION = {'CONSTANT': 0, 'LINEAR': 1, 'BEZIER': 2, 'BACK': 3, 'BOUNCE': 4, 'CIRC': 5,
+                          'CUBIC': 6, 'ELASTIC': 7, 'EXPO': 8, 'QUAD': 9, 'QUART': 10, 'QUINT': 11, 'SINE': 12}
+KEYFRAME_EASING = {'AUTO': 0, 'EASE_IN': 1, 'EASE_OUT': 2, 'EASE_IN_OUT': 3}
+
+# https://behreajj.medium.com/scripting-curves-in-blender-with-python-c487097efd13
+@profiled()
+def write_keyframes(id_data, keyframes, interpolation='LINEAR', easing='AUTO'):
+    """
+        Bulk replacement for keyframe_insert() followed by per-keyframe interpolation setup.
+        keyframes: {data_path: ([frame, ...], [value, ...])}, one fcurve is created per data path
+        and filled with keyframe_points.add() and foreach_set() on co, interpolation and easing.
+        As with keyframe_insert(), each property is left at its last keyed value.
+    """
+    if id_data.animation_data is None:
+        id_data.animation_data_create()
+    if id_data.animation_data.action is None:
+        id_data.animation_data.action = bpy.data.actions.new(id_data.name + "Action")
+        count("actions_created")
+    fcurves = id_data.animation_data.action.fcurves
+    for data_path, (frames, values) in keyframes.items():
+        n_keyframes = len(frames)
+        fcurve = fcurves.find(data_path)
+        if fcurve is None:
+            fcurve = fcurves.new(data_path)
+            count("fcurves_created")
+        first_keyframe = len(fcurve.keyframe_points)
+        fcurve.keyframe_points.add(n_keyframes)
+        co = np.empty((len(fcurve.keyframe_points), 2), dtype=np.float32)
+        fcurve.keyframe_points.foreach_get("co", co.ravel())
+        co[first_keyframe:, 0] = frames
+        co[first_keyframe:, 1] = values
+        fcurve.keyframe_points.foreach_set("co", co.ravel())
+        fcurve.keyframe_points.foreach_set("interpolation", np.full(len(co), KEYFRAME_INTERPOLATION[interpolation], dtype=np.int32))
+        fcurve.keyframe_points.foreach_set("easing", np.full(len(co), KEYFRAME_EASING[easing], dtype=np.int32))
+        fcurve.update()
+        setattr(id_data, data_path, values[-1])
+        count("keyframes", n_keyframes)
+        count("rna.foreach_set", 3)
+        count("rna.foreach_get")
+
+# Analytic animation mode: instead of an action per copy, animated properties store
+# (frame_start, frame_end, value_start, value_end, easing) in a custom property of curve data,
+# and one frame change handler evaluates all of them as arrays.
+ANALYTIC_PROPERTY = "analytic_animation"
+ANALYTIC_ANIMATION = {}
+
+@profiled()
+def write_analytic_keyframes(id_data, keyframes, interpolation='LINEAR'):
+    """
+        Drop-in replacement for write_keyframes() in analytic mode.
+        Single keyframes only set the value, pairs of keyframes are stored as analytic parameters.
+    """
+    params = dict(id_data.get(ANALYTIC_PROPERTY, {}))
+    for data_path, (frames, values) in keyframes.items():
+        if len(frames) == 2:
+            params[data_path] = [frames[0], frames[1], values[0], values[1], ANALYTIC_EASING[interpolation]]
+            count("analytic_animations")
+        setattr(id_data, data_path, values[-1])
+    id_data[ANALYTIC_PROPERTY] = params
+
+def write_animation(id_data, animations, analytic=False):
+    """
+        Write animation parameters {data_path: (frame_start, frame_end, value_start, value_end, easing)}
+        (see ink_nature.core.animation_parameters) as 2-keyframe fcurves, or as analytic parameters.
+    """
+    write = write_analytic_keyframes if analytic else write_keyframes
+    interpolation = {easing: name for name, easing in ANALYTIC_EASING.items()}
+    for data_path, (frame_start, frame_end, value_start, value_end, easing) in animations.items():
+        write(id_data, {data_path: ([float(frame_start), float(frame_end)], [float(value_start), float(value_end)])}, interpolation[float(easing)])
+
+@profiled()
+def collect_analytic_animation():
+    """
+        Gather analytic animation parameters of all curves into one (curves, params) pair per data path.
+    """
+    gathered = {}
+    for curve in bpy.data.curves:
+        for data_path, params in curve.get(ANALYTIC_PROPERTY, {}).items():
+            curves, rows = gathered.setdefault(data_path, ([], []))
+            curves.append(curve)
+            rows.append(list(params))
+    ANALYTIC_ANIMATION.clear()
+    for data_path, (curves, rows) in gathered.items():
+        ANALYTIC_ANIMATION[data_path] = (curves, np.array(rows, dtype=np.float64))
+
+@bpy.app.handlers.persistent
+@profiled()
+def update_analytic_animation(scene, depsgraph=None):
+    """
+        frame_change_pre handler: set animated properties of all analytic copies for current frame.
+        Persistent, so it keeps running after loading another file (curves are collected again).
+    """
+    frame = scene.frame_current_final
+    for _ in range(2):
+        try:
+            for data_path, (curves, params) in ANALYTIC_ANIMATION.items():
+                for curve, value in zip(curves, evaluate_analytic_animation(params, frame).tolist()):
+                    setattr(curve, data_path, value)
+            return
+        except ReferenceError:
+            # Curves were removed since last collection.
+            collect_analytic_animation()
+
+# Handlers are not saved with the .blend: a registered text block (run on file load when auto-run of
+# Python scripts is enabled, e.g. `blender -b -y file.blend -a`) installs the handler again.
+ANALYTIC_TEXT = "ink_nature_analytic_animation.py"
+ANALYTIC_TEXT_BODY = """# Generated by ink_nature: installs frame change handler of analytic animation on file load.
+import os
+import sys
+import bpy
+for path in (bpy.path.abspath("//"), {package_parent!r}):
+    if path and path not in sys.path and os.path.isdir(os.path.join(path, "ink_nature")):
+        sys.path.append(path)
+from ink_nature.blender import register_analytic_animation
+register_analytic_animation()
+"""
+
+def register_analytic_animation():
+    """
+        Collect analytic animations and (re)install frame change handler. Also adds registered text block
+        ANALYTIC_TEXT, so the saved .blend installs the handler when opened (e.g. to render in background),
+        and locks the interface during render since the handler changes curve data.
+    """
+    collect_analytic_animation()
+    # Replace handler from previous runs, one handler covers all curves.
+    handlers = bpy.app.handlers.frame_change_pre
+    for handler in [h for h in handlers if h.__name__ == update_analytic_animation.__name__]:
+        handlers.remove(handler)
+    if not ANALYTIC_ANIMATION:
+        if ANALYTIC_TEXT in bpy.data.texts:
+            bpy.data.texts.remove(bpy.data.texts[ANALYTIC_TEXT])
+        return
+    handlers.append(update_analytic_animation)
+    update_analytic_animation(bpy.context.scene)
+    bpy.context.scene.render.use_lock_interface = True
+    if ANALYTIC_TEXT not in bpy.data.texts:
+        text = bpy.data.texts.new(ANALYTIC_TEXT)
+        text.from_string(ANALYTIC_TEXT_BODY.format(package_parent=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+        text.use_module = True
+
+def default_cache_dir():
+    # INK_NATURE_CACHE_DIR if set (e.g. by benchmarks), else next to .blend file, or in temp directory for unsaved files.
+    if os.environ.get("INK_NATURE_CACHE_DIR"):
+        return os.environ["INK_NATURE_CACHE_DIR"]
+    blend_dir = bpy.path.abspath("//")
+    return os.path.join(blend_dir if blend_dir else tempfile.gettempdir(), "generator_cache")
+
+# Camera view for culling and level of detail (see ink_nature.core.screen_sizes).
+def camera_is_static(camera):
+    return camera.animation_data is None and camera.data.animation_data is None and camera.parent is None and len(camera.constraints) == 0
+
+@profiled()
+def camera_view(scene, frame_start, frame_end, frame_step=1):
+    """
+        View of scene camera over [frame_start, frame_end]: projection @ world-to-camera matrices (F, 4, 4)
+        sampled every frame_step frames (once for a static camera), render resolution in pixels,
+        ortho (orthographic camera) and key (hash of all, for cache keys and parameter hashes).
+        None if scene has no camera.
+    """
+    camera = scene.camera
+    if camera is None:
+        return None
+    render = scene.render
+    resolution = (render.resolution_x * render.resolution_percentage // 100, render.resolution_y * render.resolution_percentage // 100)
+    frame_current = scene.frame_current
+    subframe = scene.frame_subframe
+    if camera_is_static(camera):
+        frames = [frame_current]
+    else:
+        frames = sorted(set(range(frame_start, frame_end + 1, frame_step)) | {frame_end})
+    depsgraph = bpy.context.evaluated_depsgraph_get()
+    view_projections = []
+    for frame in frames:
+        if frame != scene.frame_current:
+            scene.frame_set(frame)
+        camera_eval = camera.evaluated_get(depsgraph)
+        projection = camera_eval.calc_matrix_camera(depsgraph, x=resolution[0], y=resolution[1], scale_x=render.pixel_aspect_x, scale_y=render.pixel_aspect_y)
+        view_projections.append(np.array(projection @ camera_eval.matrix_world.normalized().inverted()))
+    if scene.frame_current != frame_current:
+        scene.frame_set(frame_current, subframe=subframe)
+    view = {"view_projections": np.stack(view_projections), "resolution": np.array(resolution, dtype=np.float64), "ortho": camera.data.type == 'ORTHO'}
+    view["key"] = hash_arrays(view["view_projections"], view["resolution"], view["ortho"])
+    return view
+
+def origin_radius(obj):
+    # Radius of sphere around object origin enclosing its bounding box, in local units (object scale not applied).
+    return float(np.linalg.norm(np.array(obj.bound_box), axis=1).max())
+
+def world_bound_sphere(obj):
+    # Center and radius of sphere enclosing world-space bounding box of object.
+    corners = transform_points(np.array(obj.bound_box), np.array(obj.matrix_world))
+    center = (corners.min(axis=0) + corners.max(axis=0)) * 0.5
+    return center, float(np.linalg.norm(corners - center, axis=1).max())
+
+def apply_curve_lod(curve, fraction):
+    # Scale curve resolution (viewport, and render if set) by level of detail fraction.
+    curve.resolution_u = int(lod_resolution(curve.resolution_u, fraction))
+    if curve.render_resolution_u > 0:
+        curve.render_resolution_u = int(lod_resolution(curve.render_resolution_u, fraction))
+
+@profiled()
+def guide_hash(base_curve, *parts):
+    """
+        Hash of guide curve points, transform and curve settings copied to generated objects,
+        together with given parts (generator name, parameters, seed).
+    """
+    curve_points = read_curve_points(base_curve)
+    data = base_curve.data
+    settings = (data.bevel_depth, data.bevel_resolution, data.extrude, data.resolution_u, data.use_fill_caps, [material.name if material else None for material in data.materials])
+    return hash_arrays(*parts, base_curve.name, settings, np.array(base_curve.matrix_world), *[curve_points[name] for name in sorted(curve_points)])
+
+# Generated objects are tagged (custom properties) with generator, source guide, shard and parameter hash,
+# so re-runs can skip unchanged outputs and replace stale ones instead of stacking duplicates.
+# While GENERATOR_RUN is set (generate_farm.py workers), outputs are also tagged with it, to tell them
+# apart from outputs already in the source file.
+GENERATOR_RUN = None
+
+def tag_generated(obj, generator, source_guide, shard, param_hash):
+    obj["generator"] = generator
+    obj["source_guide"] = source_guide
+    obj["generator_shard"] = shard
+    obj["param_hash"] = param_hash
+    if GENERATOR_RUN is not None:
+        obj["generator_run"] = GENERATOR_RUN
+
+def create_empty_marker(name, collection_name):
+    """
+        Hidden empty standing in for outputs of a guide that produced none (e.g. all copies culled).
+        Tagged like outputs, so incremental runs see the guide as up to date instead of recomputing it.
+    """
+    obj = bpy.data.objects.new(name + "_no_output", None)
+    obj.empty_display_size = 0.0
+    obj.hide_viewport = True
+    obj.hide_render = True
+    add_object_to_collection(obj, collection_name)
+    count("objects_created")
+    return obj
+
+@profiled()
+def find_generated(collection_name, generator):
+    """
+        Objects of collection tagged by generator, grouped by source guide name.
+    """
+    generated = {}
+    if collection_name not in bpy.data.collections:
+        return generated
+    for obj in bpy.data.collections[collection_name].objects:
+        if obj.get("generator") == generator:
+            generated.setdefault(obj["source_guide"], []).append(obj)
+    return generated
+
+def is_up_to_date(objects, param_hash):
+    return len(objects) > 0 and all(obj.get("param_hash") == param_hash for obj in objects)
+
+@profiled()
+def remove_generated(objects):
+    """
+        Remove objects together with their data and actions in a single batch_remove.
+        Data and actions still used by objects which are kept are not removed.
+    """
+    objects = set(objects)
+    data_users = {}
+    for obj in objects:
+        if obj.data is not None:
+            data_users[obj.data] = data_users.get(obj.data, 0) + 1
+    orphans = {data for data, n_users in data_users.items() if data.users - int(data.use_fake_user) <= n_users}
+    action_users = {}
+    for id_data in objects | orphans:
+        animation_data = getattr(id_data, "animation_data", None)
+        if animation_data is not None and animation_data.action is not None:
+            action_users[animation_data.action] = action_users.get(animation_data.action, 0) + 1
+    orphans |= {action for action, n_users in action_users.items() if action.users - int(action.use_fake_user) <= n_users}
+    forget_shared(orphans) # Addresses of removed data can be reused by new data.
+    bpy.data.batch_remove(objects | orphans)
+    count("datablocks_removed", len(objects | orphans))
+
+# Tiled streaming generation (see ink_nature.tiles): every tile collection is written to its own library
+# and removed from current file, tiles are linked back as collection instances.
+def default_tile_dir(collection_name):
+    # <collection>_tiles next to .blend file, or in temp directory for unsaved files.
+    blend_dir = bpy.path.abspath("//")
+    return os.path.join(blend_dir if blend_dir else tempfile.gettempdir(), collection_name + "_tiles")
+
+def release_collection(collection):
+    # Remove collection with its objects, their data and actions.
+    remove_generated(list(collection.all_objects))
+    bpy.data.collections.remove(collection)
+
+@profiled()
+def write_tile(collection, path):
+    """
+        Write collection (with objects, data, materials and actions) to library .blend at path,
+        then release it from current file.
+    """
+    tmp_path = "{}.{}.tmp.blend".format(os.path.splitext(path)[0], os.getpid())
+    bpy.data.libraries.write(tmp_path, {collection}, fake_user=True)
+    os.replace(tmp_path, path)
+    count("tiles_written")
+    release_collection(collection)
+
+def tile_libraries(tile_dir):
+    tile_dir = os.path.normcase(os.path.abspath(tile_dir))
+    return [library for library in bpy.data.libraries
+            if os.path.normcase(os.path.dirname(os.path.abspath(bpy.path.abspath(library.filepath)))) == tile_dir]
+
+@profiled()
+def unlink_tiles(tile_dir, collection_name, generator):
+    """
+        Remove tile instances of generator from collection and libraries of tile_dir from current file,
+        so tiles can be regenerated and linked again.
+    """
+    remove_generated([obj for objects in find_generated(collection_name, generator).values() for obj in objects])
+    for library in tile_libraries(tile_dir):
+        bpy.data.libraries.remove(library)
+
+@profiled()
+def link_tiles(tile_dir, tiles, collection_name, generator):
+    """
+        Link tile collections {tile name: record} from their libraries and instance each of them
+        by one empty in collection, tagged as generated with the tile hash. Returns created empties.
+    """
+    empties = []
+    for name, record in sorted(tiles.items()):
+        with bpy.data.libraries.load(os.path.join(tile_dir, record["library"]), link=True, relative=bool(bpy.data.filepath)) as (data_from, data_to):
+            data_to.collections = [record["collection"]]
+        if data_to.collections[0] is None:
+            continue
+        empty = bpy.data.objects.new(name, None)
+        empty.instance_type = 'COLLECTION'
+        empty.instance_collection = data_to.collections[0]
+        count("objects_created")
+        add_object_to_collection(empty, collection_name)
+        tag_generated(empty, generator, name, "0/1", record["hash"])
+        empties.append(empty)
+    return empties
+
+@profiled()
+def generate_copy_tiles(guides, collection_name, generator, parameters, copy_parameters, create_copies, tile_size, tile_dir, seed=0, incremental=True, shard_index=0, n_shards=1):
+    """
+        Tiled streaming generation for copy generators. copy_parameters(base_curve) returns locations,
+        radius and keep mask of all copies of guide, create_copies(base_curve, collection_name, copies, copy_index)
+        creates the given copies. Kept copies of all guides are grouped by tile, every n_shards-th tile that is
+        missing or changed is generated into its own collection, written to a library in tile_dir and released
+        before the next one. Tiles left without copies are deleted by first shard. Returns tile index.
+    """
+    guide_hashes = {}
+    # Copy parameters of every guide are computed once and indexed per tile.
+    guide_copies = {}
+    tile_copies = {}
+    for base_curve in guides:
+        copies = copy_parameters(base_curve)
+        guide_copies[base_curve.name] = copies
+        guide_hashes[base_curve.name] = guide_hash(base_curve, generator, seed, parameters)
+        copy_index = np.flatnonzero(copies["keep"])
+        for key, index in group_by_tile(copies["locations"][copy_index], tile_size, copy_index).items():
+            tile_copies.setdefault(key, []).append((base_curve, index))
+    os.makedirs(tile_dir, exist_ok=True)
+    names = set()
+    for tile_index, key in enumerate(sorted(tile_copies)):
+        name = tile_name(collection_name, key)
+        names.add(name)
+        if tile_index % n_shards != shard_index:
+            continue
+        entries = tile_copies[key]
+        tile_hash = hash_arrays(generator, key, tile_size, *[part for base_curve, index in entries for part in (guide_hashes[base_curve.name], index)])
+        record = read_tile_record(tile_dir, name)
+        if incremental and record is not None and record["hash"] == tile_hash and os.path.exists(os.path.join(tile_dir, record["library"])):
+            continue
+        n_copies = sum(len(index) for base_curve, index in entries)
+        with stage("tile", tile=name, items=n_copies):
+            # Leftover of an interrupted run.
+            if name in bpy.data.collections:
+                release_collection(bpy.data.collections[name])
+            collection = bpy.data.collections.new(name)
+            lower = []
+            upper = []
+            for base_curve, index in entries:
+                copies = guide_copies[base_curve.name]
+                create_copies(base_curve, collection.name, copies, index)
+                lower.append(copies["locations"][index] - copies["radius"][index, np.newaxis])
+                upper.append(copies["locations"][index] + copies["radius"][index, np.newaxis])
+            write_tile(collection, os.path.join(tile_dir, name + ".blend"))
+            write_tile_record(tile_dir, name, {
+                "library": name + ".blend",
+                "collection": name,
+                "generator": generator,
+                "key": list(key),
+                "tile_size": tile_size,
+                "bounds": [np.concatenate(lower).min(axis=0).tolist(), np.concatenate(upper).max(axis=0).tolist()],
+                "n_copies": int(n_copies),
+                "hash": tile_hash})
+    if shard_index == 0:
+        for name in set(tile_names(tile_dir)) - names:
+            remove_tile(tile_dir, name)
+    return update_tile_index(tile_dir)
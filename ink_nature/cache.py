@@ -0,0 +1,70 @@
+
+# On-disk cache of generated arrays (.npz), keyed by hash of guide data, parameters and seed
+# (see ink_nature.core.hash_arrays). Plain NumPy, no bpy.
+
+import os
+import numpy as np
+
+from .profiling import count, profiled
+
+# Estimated size of every cache directory used by this process, so stores rescan it only when
+# the estimate crosses max_bytes. Other processes (farm workers) may add entries meanwhile.
+CACHE_BYTES = {}
+
+@profiled()
+def cache_load(cache_dir, key):
+    """
+        Arrays stored under key, or None. An entry evicted by another process meanwhile is a miss.
+    """
+    path = os.path.join(cache_dir, key + ".npz")
+    try:
+        os.utime(path) # Mark as recently used for eviction.
+        with np.load(path) as data:
+            arrays = {name: data[name] for name in data.files}
+    except FileNotFoundError:
+        count("cache_misses")
+        return None
+    count("cache_hits")
+    return arrays
+
+def cache_entries(cache_dir):
+    # (mtime, size, path) of all entries, skipping entries removed by another process while scanning.
+    entries = []
+    for entry in os.scandir(cache_dir):
+        if not entry.name.endswith(".npz") or entry.name.endswith(".tmp.npz"):
+            continue
+        try:
+            stat = entry.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, entry.path))
+    return entries
+
+@profiled()
+def cache_store(cache_dir, key, arrays, max_bytes):
+    """
+        Store arrays under key, then evict least recently used entries until cache fits into max_bytes.
+        The directory is scanned on first store and when the estimated size exceeds max_bytes only.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, key + ".npz")
+    # Write under temporary name first, parallel workers may store the same key.
+    tmp_path = os.path.join(cache_dir, "{}.{}.tmp.npz".format(key, os.getpid()))
+    np.savez(tmp_path, **arrays)
+    size = os.path.getsize(tmp_path)
+    os.replace(tmp_path, path)
+    if cache_dir in CACHE_BYTES:
+        CACHE_BYTES[cache_dir] += size
+        if CACHE_BYTES[cache_dir] <= max_bytes:
+            return
+    entries = sorted(cache_entries(cache_dir))
+    total_bytes = sum(size for _, size, _ in entries)
+    for _, size, entry_path in entries:
+        if total_bytes <= max_bytes:
+            break
+        total_bytes -= size
+        try:
+            os.remove(entry_path)
+        except FileNotFoundError:
+            pass # Evicted by another process.
+    CACHE_BYTES[cache_dir] = total_bytes
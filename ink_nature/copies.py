@@ -0,0 +1,246 @@
+
+# Shared copy generator of copy_animate_curve_bevel.py and copy_animate_curve_extrude.py: random copies of guide
+# curves with animated growth and one animated shape property (bevel depth or extrusion). A script describes
+# its variant as dict (see create_instancing_node_group and generate_curve_copies), requires bpy.
+
+import os
+import bpy
+import numpy as np
+
+from .core import animation_parameters, copy_lod, copy_variations, random_range
+from .profiling import finish_profile, stage, start_profile
+from .tiles import tiles_in_region
+from .blender import (apply_curve_lod, camera_view, copy_obj, create_empty_marker, create_instance_points, default_tile_dir, find_generated, frame_lerp,
+    generate_copy_tiles, guide_hash, is_up_to_date, link_tiles, named_attribute, origin_radius, register_analytic_animation,
+    remove_generated, tag_generated, unlink_tiles, write_animation)
+
+# Instancing mode: one curve datablock per guide, per-copy variation stored as point attributes
+# and applied by a Geometry Nodes modifier instead of a deep copy of the curve per instance.
+def create_instancing_node_group(variant):
+    """
+        Instance guide curve on points, then animate growth (trim) from per-point attributes instance_rotation
+        and instance_scale. Shape nodes of variant are added by variant["build_nodes"](tree, group_in, frame, curve),
+        which returns output geometry; variant["node_inputs"] lists its extra (socket type, name) inputs.
+    """
+    if variant["node_group"] in bpy.data.node_groups:
+        return bpy.data.node_groups[variant["node_group"]]
+    tree = bpy.data.node_groups.new(variant["node_group"], 'GeometryNodeTree')
+    tree.inputs.new('NodeSocketGeometry', "Geometry")
+    tree.inputs.new('NodeSocketObject', "Curve")
+    tree.inputs.new('NodeSocketFloat', "Frame Start")
+    tree.inputs.new('NodeSocketFloat', "Frame End")
+    tree.inputs.new('NodeSocketFloat', "Start Growth")
+    tree.inputs.new('NodeSocketFloat', "Growth End")
+    for socket_type, name in variant["node_inputs"]:
+        tree.inputs.new(socket_type, name)
+    tree.outputs.new('NodeSocketGeometry', "Geometry")
+    nodes, links = tree.nodes, tree.links
+    group_in = nodes.new('NodeGroupInput')
+    group_out = nodes.new('NodeGroupOutput')
+    # Guide curve in its own space, placed on every point.
+    curve_info = nodes.new('GeometryNodeObjectInfo')
+    curve_info.transform_space = 'ORIGINAL'
+    links.new(group_in.outputs["Curve"], curve_info.inputs["Object"])
+    instance = nodes.new('GeometryNodeInstanceOnPoints')
+    links.new(group_in.outputs["Geometry"], instance.inputs["Points"])
+    links.new(curve_info.outputs["Geometry"], instance.inputs["Instance"])
+    links.new(named_attribute(tree, "instance_rotation", 'FLOAT_VECTOR'), instance.inputs["Rotation"])
+    links.new(named_attribute(tree, "instance_scale", 'FLOAT'), instance.inputs["Scale"])
+    realize = nodes.new('GeometryNodeRealizeInstances')
+    links.new(instance.outputs["Instances"], realize.inputs["Geometry"])
+    # Growth.
+    frame = nodes.new('GeometryNodeInputSceneTime').outputs["Frame"]
+    trim = nodes.new('GeometryNodeTrimCurve')
+    trim.mode = 'FACTOR'
+    trim.inputs["Start"].default_value = 0.0
+    links.new(realize.outputs["Geometry"], trim.inputs["Curve"])
+    links.new(frame_lerp(tree, group_in, frame, group_in.outputs["Start Growth"], group_in.outputs["Growth End"]), trim.inputs["End"])
+    links.new(variant["build_nodes"](tree, group_in, frame, trim.outputs["Curve"]), group_out.inputs["Geometry"])
+    return tree
+
+def instance_curve_copies(variant, base_curve, collection_name, n_copies, translation_factor, scale_factor, frame_start, frame_end, value_min, value_max, start_value, start_growth, growth_factor_end, seed=0, keep=None):
+    """
+        Instancing counterpart of create_copies(): same random transforms, growth and animated value,
+        but one hidden curve datablock per guide and one point per copy.
+        keep is an optional mask of copies to instance (camera culling and level of detail).
+    """
+    # Shared curve source. Shape is done by node group, curve itself stays flat.
+    curve_src = copy_obj(base_curve, collection_name)
+    curve_src.name = base_curve.name + "_instance_src"
+    curve_src.data.animation_data_clear()
+    setattr(curve_src.data, variant["data_path"], 0.0)
+    curve_src.data.bevel_factor_start = 0.0
+    curve_src.data.bevel_factor_end = 1.0
+    curve_src.hide_viewport = True
+    curve_src.hide_render = True
+    # Per-copy attributes, same random numbers as copy_parameters().
+    variations = copy_variations(base_curve.name, n_copies, base_curve.location, base_curve.rotation_euler, translation_factor, scale_factor, seed)
+    value_end = random_range(seed, base_curve.name, variant["purpose"], n_copies, value_min, value_max)
+    if keep is not None:
+        variations = {name: values[keep] for name, values in variations.items()}
+        value_end = value_end[keep]
+    points = create_instance_points(
+        base_curve.name + "_instances",
+        variations["locations"],
+        {"instance_rotation": variations["rotations"], "instance_scale": variations["scales"], variant["purpose"] + "_end": value_end},
+        base_curve.data.materials,
+        collection_name)
+    node_group = create_instancing_node_group(variant)
+    modifier = points.modifiers.new("instances", 'NODES')
+    modifier.node_group = node_group
+    inputs = {
+        "Curve": curve_src,
+        "Frame Start": float(frame_start),
+        "Frame End": float(frame_end),
+        "Start Growth": start_growth,
+        "Growth End": growth_factor_end}
+    inputs.update(variant["modifier_inputs"](base_curve, start_value))
+    for name, value in inputs.items():
+        modifier[node_group.inputs[name].identifier] = value
+    return points, curve_src
+
+def copy_parameters(variant, base_curve, n_copies, translation_factor, scale_factor, frame_start, frame_end, value_min, value_max, start_value, start_growth, growth_factor_end, seed=0, view=None, lod_full_detail_pixels=64.0, lod_min_fraction=0.0):
+    """
+        Random transforms, bounding radius, animation parameters and level of detail of all copies of guide,
+        same random numbers as instance_curve_copies(). keep marks copies inside the camera view
+        and not thinned out by level of detail (all copies without view).
+    """
+    copies = copy_variations(base_curve.name, n_copies, base_curve.location, base_curve.rotation_euler, translation_factor, scale_factor, seed)
+    value_end = random_range(seed, base_curve.name, variant["purpose"], n_copies, value_min, value_max)
+    copies["animations"] = {
+        "bevel_factor_start": animation_parameters(frame_start, frame_end, start_growth, np.full(n_copies, growth_factor_end)),
+        variant["data_path"]: animation_parameters(frame_start, frame_end, start_value, value_end)}
+    copies["radius"] = (origin_radius(base_curve) + value_max) * copies["scales"]
+    copies["fractions"] = np.ones(n_copies)
+    copies["keep"] = np.ones(n_copies, dtype=bool)
+    if view is not None:
+        copies["fractions"], copies["keep"] = copy_lod(seed, base_curve.name, copies["locations"], copies["radius"], view, lod_full_detail_pixels, lod_min_fraction)
+    return copies
+
+def create_copies(base_curve, collection_name, copies, copy_index, analytic=False, lod=False):
+    """
+        Deep copies copy_index of guide in collection, with transforms, animation and (with lod)
+        curve resolution from copy_parameters(). Returns created objects.
+    """
+    objects = []
+    for i in copy_index:
+        # Create a copy.
+        curve_cpy = copy_obj(base_curve, collection_name)
+        # Random rotation around Z axis, translation in XY around base curve and scaling (XYZ).
+        curve_cpy.location = copies["locations"][i]
+        curve_cpy.rotation_euler = copies["rotations"][i]
+        rand_scale = copies["scales"][i]
+        curve_cpy.scale = (rand_scale, rand_scale, rand_scale)
+        # Animate curve growth and shape.
+        curve_cpy.data.bevel_factor_end = 0.0
+        write_animation(curve_cpy.data, {data_path: parameters[i] for data_path, parameters in copies["animations"].items()}, analytic=analytic)
+        if lod:
+            apply_curve_lod(curve_cpy.data, copies["fractions"][i])
+        # Add cube at the end.
+        """
+        curve_type = curve_cpy.data.splines[0].type
+        if curve_type == "BEZIER":
+            points = curve_cpy.data.splines[0].bezier_points
+            bpy.ops.mesh.primitive_cube_add(size=0.0, enter_editmode=False, align='WORLD', location=points[-1].co, scale=(1, 1, 1))
+            cube = bpy.context.selected_objects[0]
+            cube.scale = mathutils.Vector((0, 0, 0))
+            cube.keyframe_insert(data_path="scale", frame=frame_start)
+            cube.keyframe_insert(data_path="scale", frame=frame_end-1)
+            cube.scale = mathutils.Vector((rand_scale, rand_scale, rand_scale))
+            cube.keyframe_insert(data_path="scale", frame=frame_end)
+        """
+        objects.append(curve_cpy)
+    return objects
+
+def generate_curve_copies(variant, config, seed=0, shard_index=0, n_shards=1):
+    """
+        Entry point of copy generators: main() of variant["generator"] with its config (CONFIG with overrides).
+        Animated value range and start are read from config entries variant["min_max_key"] and variant["start_key"],
+        animated property is variant["data_path"], its random numbers are keyed by variant["purpose"].
+        Returns names of destination collections.
+    """
+    n_copies_per_base_curve = config["n_copies_per_base_curve"]
+    translation_factor = config["translation_factor"]
+    scale_factor = config["scale_factor"]
+    frame_start = config["frame_start"]
+    frame_end = config["frame_end"]
+    value_min_max = config[variant["min_max_key"]]
+    target_collection = config["target_collection"]
+    dest_collection = config["dest_collection"]
+    start_value = config[variant["start_key"]]
+    start_growth = config["start_growth"]
+    growth_factor_end = config["growth_factor_end"]
+    use_instancing = config["use_instancing"]
+    use_analytic_animation = config["use_analytic_animation"]
+    use_camera_lod = config["use_camera_lod"]
+    lod_full_detail_pixels = config["lod_full_detail_pixels"]
+    lod_min_fraction = config["lod_min_fraction"]
+    use_tiles = config["use_tiles"]
+    tile_size = config["tile_size"]
+    tile_dir = config["tile_dir"] or default_tile_dir(dest_collection)
+    link_generated_tiles = config["link_generated_tiles"]
+    link_region = config["link_region"]
+    incremental = config["incremental"]
+    generator = variant["generator"]
+    shard = "{}/{}".format(shard_index, n_shards)
+    # Per-stage timings and counters, enabled by INK_NATURE_PROFILE=<trace.json>: summary table and Chrome trace.
+    profile_path = os.environ.get("INK_NATURE_PROFILE")
+    start_profile(profile_path, generator)
+    parameters = (n_copies_per_base_curve, translation_factor, scale_factor, frame_start, frame_end, value_min_max, start_value, start_growth, growth_factor_end, use_instancing, use_analytic_animation)
+    view = camera_view(bpy.context.scene, frame_start, frame_end) if use_camera_lod else None
+    if view is not None:
+        # Outputs depend on camera too.
+        parameters += (lod_full_detail_pixels, lod_min_fraction, view["key"])
+    copy_settings = (n_copies_per_base_curve, translation_factor, scale_factor, frame_start, frame_end, value_min_max[0], value_min_max[1], start_value, start_growth, growth_factor_end, seed, view, lod_full_detail_pixels, lod_min_fraction)
+    instance_settings = (n_copies_per_base_curve, translation_factor, scale_factor, frame_start, frame_end, value_min_max[0], value_min_max[1], start_value, start_growth, growth_factor_end, seed)
+    if use_tiles:
+        # Tile libraries may be rewritten, drop their instances and linked data first.
+        unlink_tiles(tile_dir, dest_collection, generator)
+        if use_instancing:
+            create = lambda base_curve, collection_name, copies, copy_index: instance_curve_copies(
+                variant, base_curve, collection_name, *instance_settings, np.isin(np.arange(n_copies_per_base_curve), copy_index))
+        else:
+            create = lambda base_curve, collection_name, copies, copy_index: create_copies(base_curve, collection_name, copies, copy_index, lod=view is not None)
+        tiles = generate_copy_tiles(
+            bpy.data.collections[target_collection].all_objects, dest_collection, generator, parameters,
+            lambda base_curve: copy_parameters(variant, base_curve, *copy_settings), create, tile_size, tile_dir, seed, incremental, shard_index, n_shards)
+        # Shard workers only write tiles, a final run with n_shards=1 links them (all tiles are up to date by then).
+        if link_generated_tiles and n_shards == 1:
+            link_tiles(tile_dir, tiles_in_region(tiles, link_region), dest_collection, generator)
+        finish_profile(profile_path)
+        return [dest_collection]
+    # Find stale outputs (changed or removed guides) and remove them before generating.
+    generated = find_generated(dest_collection, generator)
+    stale = []
+    to_generate = []
+    for guide_index, base_curve in enumerate(bpy.data.collections[target_collection].all_objects):
+        previous = generated.pop(base_curve.name, [])
+        if guide_index % n_shards != shard_index:
+            continue
+        param_hash = guide_hash(base_curve, generator, seed, parameters)
+        if incremental and is_up_to_date(previous, param_hash):
+            continue
+        stale += previous
+        to_generate.append((base_curve, param_hash))
+    # Outputs of removed guides are dropped by first shard only.
+    if shard_index == 0:
+        for objects in generated.values():
+            stale += objects
+    remove_generated(stale)
+    for base_curve, param_hash in to_generate:
+        with stage("guide", guide=base_curve.name, items=n_copies_per_base_curve):
+            # Random transforms and animation parameters of all copies, copies outside the camera view or thinned out by level of detail are skipped.
+            copies = copy_parameters(variant, base_curve, *copy_settings)
+            if not copies["keep"].any():
+                tag_generated(create_empty_marker(base_curve.name, dest_collection), generator, base_curve.name, shard, param_hash)
+                continue
+            if use_instancing:
+                for obj in instance_curve_copies(variant, base_curve, dest_collection, *instance_settings, copies["keep"]):
+                    tag_generated(obj, generator, base_curve.name, shard, param_hash)
+                continue
+            for obj in create_copies(base_curve, dest_collection, copies, np.flatnonzero(copies["keep"]), use_analytic_animation, view is not None):
+                tag_generated(obj, generator, base_curve.name, shard, param_hash)
+
+    register_analytic_animation()
+    finish_profile(profile_path)
+    return [dest_collection]
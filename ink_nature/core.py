@@ -0,0 +1,504 @@
+
+# Stroke generation core: plain NumPy, no bpy, so it can run, be profiled and be parallelized
+# outside of Blender. Guide point arrays in, stroke arrays and animation parameters out.
+# Moving data in and out of Blender is done by ink_nature.blender.
+
+import hashlib
+import numpy as np
+
+from .profiling import profiled
+
+# Interpolate [a,b] using factor t.
+def lerp(t, a, b):
+    return (1.0 - t) * a + t * b
+
+def transform_points(co, matrix):
+    # Apply 4x4 matrix to (N, 3) points.
+    matrix = np.asarray(matrix, dtype=np.float64)
+    return co @ matrix[:3, :3].T + matrix[:3, 3]
+
+# Counter-based random numbers: value depends only on (seed, key, counter), not on call order,
+# so results do not change with guide order, copy counts or how work is split across processes.
+def splitmix64(x):
+    x = x + np.uint64(0x9E3779B97F4A7C15)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+def random_key(seed, key):
+    # Stable across runs (unlike hash()), key is tuple like (guide name, purpose).
+    digest = hashlib.blake2b(repr((seed,) + tuple(key)).encode(), digest_size=8).digest()
+    return np.uint64(int.from_bytes(digest, "little"))
+
+def random_uniform(seed, key, counter):
+    """
+        Uniform random numbers in [0, 1) for each counter (e.g. copy or point index), same shape as counter.
+    """
+    counter = np.asarray(counter, dtype=np.uint64)
+    x = splitmix64(np.atleast_1d(counter) + random_key(seed, key))
+    return ((x >> np.uint64(11)) * (1.0 / 2**53)).reshape(counter.shape)
+
+def random_copies(seed, guide_name, n_copies, purposes):
+    """
+        Random numbers in [0, 1) for every copy of guide, one array per purpose.
+        Keyed on (guide name, purpose) and copy index, so copies do not depend on guide order.
+    """
+    copy_index = np.arange(n_copies)
+    return {purpose: random_uniform(seed, (guide_name, purpose), copy_index) for purpose in purposes}
+
+# Hash of guide data and parameters, used for cache keys and tags of generated objects.
+def hash_arrays(*parts):
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        if isinstance(part, np.ndarray):
+            digest.update(repr((part.dtype.str, part.shape)).encode())
+            digest.update(np.ascontiguousarray(part).tobytes())
+        else:
+            digest.update(repr(part).encode())
+    return digest.hexdigest()
+
+# Permutation table for batched Perlin noise (doubled to avoid index wrapping).
+# Fixed (RandomState(0)), so noise does not depend on seed; randomness comes from per-point scale.
+PERLIN_PERMUTATION = np.tile(np.random.RandomState(0).permutation(256), 2)
+
+def perlin_gradient(h, x, y, z):
+    h = h & 15
+    u = np.where(h < 8, x, y)
+    v = np.where(h < 4, y, np.where((h == 12) | (h == 14), x, z))
+    return np.where(h & 1, -u, u) + np.where(h & 2, -v, v)
+
+def perlin_noise_batch(co):
+    """
+        Signed improved Perlin noise (approx. [-1, 1]) evaluated for (N, 3) array of points.
+        https://mrl.cs.nyu.edu/~perlin/noise/
+        Not Blender's 'PERLIN_ORIGINAL' basis (different gradients and hash), values do not match mathutils.noise.
+    """
+    cell = np.floor(co)
+    x, y, z = (co - cell).T
+    xi, yi, zi = (cell.astype(np.int64) & 255).T
+    u, v, w = [t * t * t * (t * (t * 6.0 - 15.0) + 10.0) for t in (x, y, z)]
+    perm = PERLIN_PERMUTATION
+    a = perm[xi] + yi
+    b = perm[xi + 1] + yi
+    aa, ab = perm[a] + zi, perm[a + 1] + zi
+    ba, bb = perm[b] + zi, perm[b + 1] + zi
+    x1 = lerp(u, perlin_gradient(perm[aa], x, y, z), perlin_gradient(perm[ba], x - 1, y, z))
+    x2 = lerp(u, perlin_gradient(perm[ab], x, y - 1, z), perlin_gradient(perm[bb], x - 1, y - 1, z))
+    x3 = lerp(u, perlin_gradient(perm[aa + 1], x, y, z - 1), perlin_gradient(perm[ba + 1], x - 1, y, z - 1))
+    x4 = lerp(u, perlin_gradient(perm[ab + 1], x, y - 1, z - 1), perlin_gradient(perm[bb + 1], x - 1, y - 1, z - 1))
+    return lerp(w, lerp(v, x1, x2), lerp(v, x3, x4))
+
+def turbulence_vector_batch(co, n_octaves=1, amplitude_scale=1.0, frequency_scale=1.0):
+    """
+        Turbulence of perlin_noise_batch() in the spirit of mathutils.noise.turbulence_vector (soft noise):
+        octaves of noise summed with amplitude_scale and frequency_scale. Vector components are sampled
+        at fixed offset positions. Similar in character, but not the same values as Blender, so strokes
+        differ in shape from the former turbulence_vector(..., 'PERLIN_ORIGINAL') output.
+    """
+    offsets = np.array([(9.321, -1.531, -7.951), (0.0, 0.0, 0.0), (6.327, 0.1671, -2.672)])
+    turbulence = np.zeros_like(co)
+    amplitude = 1.0
+    frequency = 1.0
+    for octave in range(n_octaves):
+        for axis in range(3):
+            turbulence[:, axis] += amplitude * perlin_noise_batch(co * frequency + offsets[axis])
+        amplitude *= amplitude_scale
+        frequency *= frequency_scale
+    return turbulence
+
+@profiled()
+def perturb_offsets(co, perturb_scale=1.0, perturb_strength=1.0, n_octaves=1, amplitude_scale=1.0, frequency_scale=1.0, seed=0, key=("perturb",), counters=None):
+    """
+        Turbulence displacement (N, 3) of points co (N, 3).
+        Per-point noise scale is random_uniform(seed, key, counters), counters default to point index.
+    """
+    if counters is None:
+        counters = np.arange(len(co))
+    random_scale = random_uniform(seed, key, counters)
+    return turbulence_vector_batch(
+        co * (perturb_scale * random_scale)[:, np.newaxis],
+        n_octaves,
+        amplitude_scale=amplitude_scale,
+        frequency_scale=frequency_scale) * perturb_strength
+
+def perturb_curve_points(curve_points, perturb_scale=1.0, perturb_strength=1.0, n_octaves=1, amplitude_scale=1.0, frequency_scale=1.0, seed=0, key=("perturb",), counters=None):
+    """
+        Displace curve point buffers (see ink_nature.blender.read_curve_points) with turbulence noise,
+        as one batch. Returns new buffers. Bezier handles follow their control point, POLY/NURBS w component is kept.
+    """
+    curve_points = {name: values.copy() for name, values in curve_points.items()}
+    n_bezier = len(curve_points["bezier_co"])
+    co = np.concatenate((curve_points["bezier_co"], curve_points["points_co"][:, :3])).astype(np.float64)
+    if len(co) == 0:
+        return curve_points
+    trans_vec = perturb_offsets(co, perturb_scale, perturb_strength, n_octaves, amplitude_scale, frequency_scale, seed, key, counters)
+    curve_points["bezier_co"] += trans_vec[:n_bezier]
+    curve_points["handle_left"] += trans_vec[:n_bezier]
+    curve_points["handle_right"] += trans_vec[:n_bezier]
+    curve_points["points_co"][:, :3] += trans_vec[n_bezier:]
+    return curve_points
+
+@profiled()
+def resample_subdivisions(co, v0, v1, spacing, min_subdiv=0, max_subdiv=None):
+    """
+        Number of points to insert on each segment (v0[i], v1[i]) so that points are at most
+        spacing apart, computed from segment lengths of co (e.g. world-space coordinates).
+        Optional min_subdiv/max_subdiv cap the count per segment.
+    """
+    length = np.linalg.norm(co[v1] - co[v0], axis=1)
+    n_subdiv = np.ceil(length / spacing).astype(np.int64) - 1
+    return np.clip(n_subdiv, min_subdiv, max_subdiv)
+
+def polygon_loop_segments(loop_vertices, loop_start, loop_total):
+    """
+        Vertex indices (L,), (L,) of the segment starting at every polygon loop.
+    """
+    polygon_index = np.repeat(np.arange(len(loop_start)), loop_total)
+    next_loop = loop_start[polygon_index] + (np.arange(len(loop_vertices)) - loop_start[polygon_index] + 1) % loop_total[polygon_index]
+    return loop_vertices, loop_vertices[next_loop]
+
+@profiled()
+def subdivide_segments(co, v0, v1, n_subdiv, include_end):
+    """
+        Points along segments (v0[i], v1[i]) with n_subdiv[i] points inserted in between.
+        Segment end point is included only if include_end. Returns points (N, 3) and points per segment.
+    """
+    n_subdiv = np.broadcast_to(np.asarray(n_subdiv, dtype=np.int64), v0.shape)
+    counts = n_subdiv + 1 + int(include_end)
+    segment_index = np.repeat(np.arange(len(v0)), counts)
+    offsets = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    t = (np.arange(len(segment_index)) - offsets[segment_index]) / (n_subdiv[segment_index] + 1)
+    p0 = co[v0[segment_index]]
+    p1 = co[v1[segment_index]]
+    return p0 + (p1 - p0) * t[:, np.newaxis], counts
+
+def subdivide_polygon_loops(co, loop_vertices, loop_start, loop_total, n_subdiv=0):
+    """
+        Points of closed polygon outlines with n_subdiv points inserted on every edge,
+        same as bpy.ops.curve.subdivide(number_cuts=n_subdiv) on cyclic POLY splines.
+        n_subdiv is a number or (L,) array with count per polygon loop segment.
+        Returns points (N, 3) and number of points per polygon (P,), polygons stay in order.
+    """
+    v0, v1 = polygon_loop_segments(loop_vertices, loop_start, loop_total)
+    points, counts = subdivide_segments(co, v0, v1, n_subdiv, include_end=False)
+    polygon_counts = np.add.reduceat(counts, loop_start) if len(loop_start) > 0 else np.zeros(0, dtype=np.int64)
+    return points, polygon_counts
+
+def subdivide_edges(co, edge_vertices, n_subdiv=0):
+    """
+        Points of open edge strokes with n_subdiv points inserted between edge vertices.
+        n_subdiv is a number or (E,) array with count per edge.
+        Returns points (N, 3) and number of points per edge (E,), edges stay in order.
+    """
+    return subdivide_segments(co, edge_vertices[:, 0], edge_vertices[:, 1], n_subdiv, include_end=True)
+
+@profiled()
+def edge_faces(n_edges, loop_edges, loop_total):
+    """
+        Edge adjacency from polygon loops: number of faces of every edge (E,)
+        and its first two faces (E, 2), -1 where edge has fewer faces.
+    """
+    loop_polygons = np.repeat(np.arange(len(loop_total)), loop_total)
+    face_count = np.bincount(loop_edges, minlength=n_edges)
+    order = np.argsort(loop_edges, kind="stable")
+    first_loop = np.searchsorted(loop_edges[order], np.arange(n_edges))
+    faces = np.full((n_edges, 2), -1, dtype=np.int64)
+    has_face = face_count >= 1
+    faces[has_face, 0] = loop_polygons[order[first_loop[has_face]]]
+    has_pair = face_count >= 2
+    faces[has_pair, 1] = loop_polygons[order[first_loop[has_pair] + 1]]
+    return face_count, faces
+
+def dihedral_angles(normals, faces, face_count):
+    """
+        Angle between normals of the two faces of every edge in radians,
+        0 for boundary edges and pi for non-manifold edges (more than two faces).
+    """
+    manifold = np.flatnonzero(face_count == 2)
+    angle = np.zeros(len(face_count))
+    angle[manifold] = np.arccos(np.clip(np.einsum("ij,ij->i", normals[faces[manifold, 0]], normals[faces[manifold, 1]]), -1.0, 1.0))
+    angle[face_count > 2] = np.pi
+    return angle
+
+def select_stroke_edges(face_count, dihedral_angle, is_seam, min_dihedral_angle=0.0, include_boundary=True, include_seams=True):
+    """
+        Boolean mask of edges to stroke: edges sharper than min_dihedral_angle,
+        optionally together with boundary/wire edges and seams.
+    """
+    selected = (face_count >= 2) & (dihedral_angle >= min_dihedral_angle)
+    if include_boundary:
+        selected |= face_count <= 1
+    if include_seams:
+        selected |= is_seam
+    return selected
+
+def stroke_point_counters(stroke_index, counts):
+    """
+        Random counter per stroke point, (stroke index, point index in stroke) packed in one integer,
+        so point randomness does not depend on which other strokes are generated.
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    offsets = np.cumsum(counts) - counts
+    point_index = np.arange(int(np.sum(counts))) - np.repeat(offsets, counts)
+    return (np.repeat(np.asarray(stroke_index, dtype=np.uint64), counts) << np.uint64(32)) | point_index.astype(np.uint64)
+
+def shard_splines(points, counts, shard_index=0, n_shards=1, visible=None):
+    """
+        Keep every n_shards-th spline starting at shard_index (and only visible splines if mask is given).
+        Returns points (N, 3), counts and original index of kept splines.
+    """
+    spline_index = np.arange(len(counts))
+    keep = spline_index % n_shards == shard_index
+    if visible is not None:
+        keep &= visible
+    return points[np.repeat(keep, counts)], counts[keep], spline_index[keep]
+
+def segment_lod_subdivisions(co_world, v0, v1, n_subdiv, view, pixel_spacing, margin=0.0, min_subdiv=0):
+    """
+        Screen-space level of detail of segments (v0[i], v1[i]) seen by camera view: projected size
+        in pixels (0 outside the view) and n_subdiv capped so points are about pixel_spacing pixels apart.
+        margin (world units) enlarges segment bounds, e.g. by perturbation strength.
+    """
+    p0 = co_world[v0]
+    p1 = co_world[v1]
+    pixels = screen_sizes((p0 + p1) * 0.5, np.linalg.norm(p1 - p0, axis=1) * 0.5 + margin, view)
+    screen_subdiv = np.ceil(np.minimum(pixels, 1e9) / pixel_spacing).astype(np.int64) - 1
+    return pixels, np.maximum(np.minimum(n_subdiv, screen_subdiv), min_subdiv)
+
+@profiled()
+def mesh_strokes(mesh, matrix_world, name, settings, seed=0, shard_index=0, n_shards=1, view=None):
+    """
+        Perturbed stroke points of mesh arrays (see ink_nature.blender.read_mesh_arrays)
+        as arrays: points (N, 3), counts, bevels and cyclic.
+        Stroke mode "EDGES" strokes every unique (selected) edge n_strokes_per_edge times,
+        stroke mode "POLYGONS" strokes outline of every polygon.
+        With camera view, strokes outside the view are skipped and points are spaced
+        settings["lod_pixel_spacing"] pixels apart on screen at most.
+    """
+    co = mesh["co"]
+    co_world = transform_points(co, matrix_world)
+    stroke_spacing = settings["stroke_spacing"]
+    visible = None
+    if settings["stroke_mode"] == "EDGES":
+        # For each selected unique edge create open spline(s).
+        face_count, faces = edge_faces(len(mesh["edge_vertices"]), mesh["loop_edges"], mesh["loop_total"])
+        selected = select_stroke_edges(face_count, dihedral_angles(mesh["normals"], faces, face_count), mesh["is_seam"], settings["min_dihedral_angle"], settings["include_boundary"], settings["include_seams"])
+        stroke_edges = np.repeat(mesh["edge_vertices"][selected], settings["n_strokes_per_edge"], axis=0)
+        n_subdiv = settings["curve_n_subdiv"]
+        if stroke_spacing is not None:
+            n_subdiv = resample_subdivisions(co_world, stroke_edges[:, 0], stroke_edges[:, 1], stroke_spacing, settings["stroke_min_subdiv"], settings["stroke_max_subdiv"])
+        if view is not None:
+            pixels, n_subdiv = segment_lod_subdivisions(co_world, stroke_edges[:, 0], stroke_edges[:, 1], n_subdiv, view, settings["lod_pixel_spacing"], settings["cull_margin"], settings["stroke_min_subdiv"])
+            visible = pixels > 0.0
+        points, counts = subdivide_edges(co, stroke_edges, n_subdiv)
+        cyclic = False
+    else:
+        # For each polygon create spline following polygon edges.
+        loop_vertices, loop_start, loop_total = mesh["loop_vertices"], mesh["loop_start"], mesh["loop_total"]
+        n_subdiv = settings["curve_n_subdiv"]
+        v0, v1 = polygon_loop_segments(loop_vertices, loop_start, loop_total)
+        if stroke_spacing is not None:
+            n_subdiv = resample_subdivisions(co_world, v0, v1, stroke_spacing, settings["stroke_min_subdiv"], settings["stroke_max_subdiv"])
+        if view is not None and len(loop_start) > 0:
+            # Polygon is visible if any of its edges is.
+            pixels, n_subdiv = segment_lod_subdivisions(co_world, v0, v1, n_subdiv, view, settings["lod_pixel_spacing"], settings["cull_margin"], settings["stroke_min_subdiv"])
+            visible = np.maximum.reduceat(pixels, loop_start) > 0.0
+        points, counts = subdivide_polygon_loops(co, loop_vertices, loop_start, loop_total, n_subdiv)
+        cyclic = True
+    points, counts, stroke_index = shard_splines(points, counts, shard_index, n_shards, visible)
+    bevels = lerp(0.02, 0.05, random_uniform(seed, (name, "bevel"), stroke_index))
+    # Pertub strokes.
+    points = points + perturb_offsets(points, seed=seed, key=(name, "perturb"), counters=stroke_point_counters(stroke_index, counts), **settings["perturb"])
+    return {"points": points, "counts": counts, "bevels": bevels, "cyclic": np.array(cyclic)}
+
+@profiled()
+def feature_edge_cache(mesh, seed=0, key=("feature_edges",)):
+    """
+        Per-mesh arrays needed to find feature edges, computed once from mesh arrays.
+        Faces adjacent to each edge are in edge_faces (E, 2), -1 where edge has fewer faces.
+        Edges with more than two faces are marked in non_manifold.
+        Per-edge stroke thickness is random_uniform(seed, key + ("bevel",), edge index).
+    """
+    n_edges = len(mesh["edge_vertices"])
+    face_count, faces = edge_faces(n_edges, mesh["loop_edges"], mesh["loop_total"])
+    return {
+        "co": mesh["co"],
+        "edge_vertices": mesh["edge_vertices"],
+        "edge_faces": faces,
+        "face_count": face_count,
+        "non_manifold": face_count > 2,
+        "normals": mesh["normals"],
+        "centers": mesh["centers"],
+        "material_index": mesh["material_index"],
+        # Stroke thickness per edge, kept between frames so strokes do not flicker.
+        "edge_bevel": lerp(0.02, 0.05, random_uniform(seed, tuple(key) + ("bevel",), np.arange(n_edges)))}
+
+@profiled()
+def static_feature_edges(cache, crease_angle, include_boundary=True, include_material_borders=True):
+    """
+        View-independent feature edges: creases sharper than crease_angle (radians),
+        boundary/wire edges, edges between different materials and non-manifold edges.
+    """
+    edge_faces = cache["edge_faces"]
+    manifold = (cache["face_count"] == 2)
+    f0 = edge_faces[manifold, 0]
+    f1 = edge_faces[manifold, 1]
+    normals = cache["normals"]
+    cos_angle = np.einsum("ij,ij->i", normals[f0], normals[f1])
+    selected = cache["non_manifold"].copy()
+    selected[manifold] |= cos_angle < np.cos(crease_angle)
+    if include_boundary:
+        selected |= cache["face_count"] <= 1
+    if include_material_borders:
+        material_index = cache["material_index"]
+        selected[manifold] |= material_index[f0] != material_index[f1]
+    return selected
+
+@profiled()
+def silhouette_edges(cache, matrix_world, camera_matrix, ortho=False):
+    """
+        View-dependent silhouette edges: manifold edges between a face facing the camera and one facing away.
+        Facing is tested in object space, which is equivalent to world space for affine transforms.
+    """
+    matrix_inv = np.linalg.inv(np.asarray(matrix_world, dtype=np.float64))
+    camera_matrix = np.asarray(camera_matrix, dtype=np.float64)
+    normals = cache["normals"]
+    if ortho:
+        view_dir = matrix_inv[:3, :3] @ -camera_matrix[:3, 2]
+        facing = normals @ view_dir < 0.0
+    else:
+        camera_pos = matrix_inv[:3, :3] @ camera_matrix[:3, 3] + matrix_inv[:3, 3]
+        facing = np.einsum("ij,ij->i", normals, camera_pos - cache["centers"]) > 0.0
+    edge_faces = cache["edge_faces"]
+    selected = np.zeros(len(edge_faces), dtype=bool)
+    manifold = (cache["face_count"] == 2)
+    selected[manifold] = facing[edge_faces[manifold, 0]] != facing[edge_faces[manifold, 1]]
+    return selected
+
+@profiled()
+def feature_strokes(cache, selected, matrix_world, name, settings):
+    """
+        Perturbed stroke points of selected feature edges: points (N, 3) in object space, counts and radius per stroke.
+    """
+    stroke_index = np.flatnonzero(selected)
+    stroke_edges = cache["edge_vertices"][stroke_index]
+    co_world = transform_points(cache["co"], matrix_world)
+    n_subdiv = resample_subdivisions(co_world, stroke_edges[:, 0], stroke_edges[:, 1], settings["stroke_spacing"], settings["stroke_min_subdiv"], settings["stroke_max_subdiv"])
+    points, counts = subdivide_edges(cache["co"], stroke_edges, n_subdiv)
+    points = points + perturb_offsets(points, seed=settings["seed"], key=(name, "perturb"), counters=stroke_point_counters(stroke_index, counts), **settings["perturb"])
+    return points, counts, cache["edge_bevel"][stroke_index]
+
+@profiled()
+def copy_variations(guide_name, n_copies, location, rotation, translation_factor, scale_factor, seed=0):
+    """
+        Random transforms of copies of guide: locations (N, 3) offset in XY around guide location,
+        rotations (N, 3) with random angle around Z axis and uniform scales (N,).
+    """
+    rand = random_copies(seed, guide_name, n_copies, ("rotation", "offset_x", "offset_y", "scale"))
+    # NOTE: base curve must not have translation applied!
+    locations = np.tile(np.asarray(location, dtype=np.float64), (n_copies, 1))
+    locations[:, 0] += rand["offset_x"] * translation_factor - translation_factor / 2
+    locations[:, 1] += rand["offset_y"] * translation_factor - translation_factor / 2
+    rotations = np.tile(np.asarray(rotation, dtype=np.float64), (n_copies, 1))
+    rotations[:, 2] = rand["rotation"] * 360.0
+    return {"locations": locations, "rotations": rotations, "scales": rand["scale"] * scale_factor}
+
+def random_range(seed, guide_name, purpose, n_copies, value_min, value_max):
+    # Random value in [value_min, value_max) for every copy of guide.
+    return lerp(random_uniform(seed, (guide_name, purpose), np.arange(n_copies)), value_min, value_max)
+
+@profiled()
+def perturbed_copies(guide_points, guide_name, n_copies, perturb_settings, seed=0, copy_index=None):
+    """
+        Perturbed control points and random thickness factor of all copies of guide
+        (or only copies in copy_index), as arrays with copy as first axis.
+    """
+    copy_index = np.arange(n_copies) if copy_index is None else np.asarray(copy_index, dtype=np.int64)
+    copies = [perturb_curve_points(guide_points, seed=seed, key=(guide_name, int(i), "perturb"), **perturb_settings) for i in copy_index]
+    arrays = {name: np.stack([curve_points[name] for curve_points in copies]) if len(copies) > 0 else np.empty((0,) + values.shape, dtype=values.dtype) for name, values in guide_points.items()}
+    arrays["rand_thickness"] = random_uniform(seed, (guide_name, "thickness"), copy_index)
+    return arrays
+
+# Camera culling and level of detail. A camera view is a dict of view_projections (F, 4, 4),
+# projection @ world-to-camera matrices sampled over the animated frame range, and render resolution
+# (x, y) in pixels and ortho (True for orthographic camera) (see ink_nature.blender.camera_view).
+@profiled()
+def screen_sizes(centers, radius, view):
+    """
+        Largest projected diameter in pixels of bounding spheres (centers (N, 3), radius (N,) or number)
+        over all camera samples, 0 where sphere is outside the view frustum at every sample.
+        Spheres crossing the camera plane are infinitely large. Conservative (never smaller than the true size).
+        Orthographic views have constant size (ortho_scale is part of the projection) and test the depth
+        range between clip start and end instead of the perspective divide.
+    """
+    centers = np.asarray(centers, dtype=np.float64).reshape(-1, 3)
+    radius = np.broadcast_to(np.asarray(radius, dtype=np.float64), (len(centers),))
+    view_projections = np.asarray(view["view_projections"], dtype=np.float64)
+    resolution = np.asarray(view["resolution"], dtype=np.float64)
+    # Clip space (F, N, 4) and sphere radius in clip units along x, y and z.
+    clip = np.einsum("fij,nj->fni", view_projections[:, :, :3], centers) + view_projections[:, np.newaxis, :, 3]
+    scale = np.linalg.norm(view_projections[:, :3, :3], axis=2)
+    radius_x = radius * scale[:, 0, np.newaxis]
+    radius_y = radius * scale[:, 1, np.newaxis]
+    if view.get("ortho", False):
+        # w is 1, clip z is linear in view depth: [-1, 1] between clip start and end.
+        radius_z = radius * scale[:, 2, np.newaxis]
+        inside = (np.abs(clip[..., 2]) <= 1.0 + radius_z) & (np.abs(clip[..., 0]) <= 1.0 + radius_x) & (np.abs(clip[..., 1]) <= 1.0 + radius_y)
+        pixels = np.where(inside, np.maximum(radius_x * resolution[0], radius_y * resolution[1]), 0.0)
+        return pixels.max(axis=0) if len(pixels) > 0 else np.zeros(len(centers))
+    w = clip[..., 3]
+    near = np.abs(w) <= radius
+    # Side planes x = +-w and y = +-w: sphere is outside when its center is farther than radius from the plane,
+    # margin in clip units is radius times length of the plane normal (row x or y -+ row w).
+    rows = view_projections[:, :, :3]
+    inside = w > radius
+    for axis in (0, 1):
+        for sign in (1.0, -1.0):
+            margin = radius * np.linalg.norm(rows[:, axis] - sign * rows[:, 3], axis=1)[:, np.newaxis]
+            inside &= sign * clip[..., axis] - w <= margin
+    pixels = np.maximum(radius_x * resolution[0], radius_y * resolution[1]) / np.where(inside, w, 1.0)
+    pixels = np.where(near, np.inf, np.where(inside, pixels, 0.0))
+    return pixels.max(axis=0) if len(pixels) > 0 else np.zeros(len(centers))
+
+def lod_fractions(pixels, full_detail_pixels, min_fraction=0.0):
+    """
+        Detail fraction of objects projected to pixels: 1 at full_detail_pixels and above,
+        at least min_fraction for visible objects, 0 for objects outside the view.
+    """
+    fractions = np.clip(np.asarray(pixels, dtype=np.float64) / full_detail_pixels, min_fraction, 1.0)
+    return np.where(np.asarray(pixels) > 0.0, fractions, 0.0)
+
+def lod_resolution(resolution, fractions):
+    # Curve resolution (points per segment) scaled by detail fractions, at least 1.
+    return np.maximum(1, np.ceil(resolution * np.asarray(fractions))).astype(np.int64)
+
+@profiled()
+def copy_lod(seed, guide_name, centers, radius, view, full_detail_pixels, min_fraction=0.0):
+    """
+        Detail fraction (N,) and mask of kept copies of guide seen by camera view.
+        Copies outside the view are dropped, smaller copies are thinned out with probability
+        1 - fraction, keyed on copy index so copies kept at lower detail are a subset of those at higher.
+    """
+    fractions = lod_fractions(screen_sizes(centers, radius, view), full_detail_pixels, min_fraction)
+    keep = random_uniform(seed, (guide_name, "lod"), np.arange(len(fractions))) < fractions
+    return fractions, keep
+
+# Analytic animation: a 2-keyframe animation is stored as (frame_start, frame_end, value_start, value_end, easing).
+# Easing 0 is linear, 1 is smoothstep (same as 2-keyframe BEZIER fcurve with auto clamped handles).
+ANALYTIC_EASING = {'LINEAR': 0.0, 'BEZIER': 1.0}
+
+def animation_parameters(frame_start, frame_end, value_start, value_end, easing=0.0):
+    """
+        (N, 5) analytic animation parameters, scalars are broadcast to values of all copies.
+    """
+    return np.stack(np.broadcast_arrays(*[np.asarray(value, dtype=np.float64) for value in (frame_start, frame_end, value_start, value_end, easing)]), axis=-1).reshape(-1, 5)
+
+def evaluate_analytic_animation(params, frame):
+    """
+        Values of all analytic animations at frame. params: (N, 5) array of
+        frame_start, frame_end, value_start, value_end, easing.
+    """
+    frame_start, frame_end, value_start, value_end, easing = params.T
+    t = np.clip((frame - frame_start) / np.maximum(frame_end - frame_start, 1e-6), 0.0, 1.0)
+    t = lerp(easing, t, t * t * (3.0 - 2.0 * t))
+    return lerp(t, value_start, value_end)
@@ -0,0 +1,53 @@
+
+# Declarative generator jobs: every generator script keeps its default parameters in CONFIG,
+# a job names the script and overrides some of them (see run_jobs.py). Plain Python, no bpy.
+
+import json
+import os
+
+def job_config(defaults, overrides=None):
+    """
+        Defaults with overrides applied. Dict parameters (e.g. settings) are merged one level deep,
+        so a job can override single settings. Unknown names raise KeyError instead of being ignored.
+    """
+    config = dict(defaults)
+    for name, value in (overrides or {}).items():
+        if name not in defaults:
+            raise KeyError("Unknown parameter {!r}, expected one of: {}".format(name, ", ".join(sorted(defaults))))
+        if isinstance(defaults[name], dict) and isinstance(value, dict):
+            unknown = sorted(set(value) - set(defaults[name]))
+            if unknown:
+                raise KeyError("Unknown entries {} of parameter {!r}".format(unknown, name))
+            value = dict(defaults[name], **value)
+        config[name] = value
+    return config
+
+def load_jobs(path, script_dir=None):
+    """
+        Read job file (JSON) and return (jobs, output):
+        {"output": "scene_generated.blend",
+         "defaults": {"seed": 0, "config": {"incremental": true}},
+         "jobs": [{"generator": "copy_animate_curve_bevel.py", "seed": 1,
+                   "config": {"target_collection": "grass1_guides", "dest_collection": "grass1_generated"}}, ...]}
+        Defaults are applied to every job (config entries merged). Generator and output paths are relative
+        to the job file, generators are also looked up in script_dir. Output is None to save in place.
+    """
+    with open(path) as f:
+        data = json.load(f)
+    job_dir = os.path.dirname(os.path.abspath(path))
+    defaults = data.get("defaults", {})
+    jobs = []
+    for index, job in enumerate(data["jobs"]):
+        job = dict(defaults, **job)
+        job["config"] = dict(defaults.get("config", {}), **job.get("config", {}))
+        job.setdefault("seed", 0)
+        job.setdefault("name", "{}:{}".format(index, os.path.splitext(os.path.basename(job["generator"]))[0]))
+        generator = os.path.join(job_dir, job["generator"])
+        if not os.path.exists(generator) and script_dir is not None:
+            generator = os.path.join(script_dir, job["generator"])
+        if not os.path.exists(generator):
+            raise FileNotFoundError("Generator {!r} of job {!r} not found".format(job["generator"], job["name"]))
+        job["generator"] = generator
+        jobs.append(job)
+    output = data.get("output")
+    return jobs, os.path.join(job_dir, output) if output else None
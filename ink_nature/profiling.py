@@ -0,0 +1,127 @@
+
+# Opt-in per-stage profiling of generators: stage timings (nested, with per-guide/per-polygon
+# arguments), counters (datablocks created, RNA bulk calls, keyframes, ...), a summary table
+# and Chrome trace JSON (chrome://tracing or https://ui.perfetto.dev). Plain Python, no bpy.
+# When profiling is off, stage() returns a shared no-op context and count() only checks a global.
+
+import contextlib
+import functools
+import json
+import os
+import time
+
+PROFILE = None
+NO_STAGE = contextlib.nullcontext()
+
+class Profile:
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.events = []
+        self.counters = {}
+
+class Stage:
+    def __init__(self, profile, name, args):
+        self.profile = profile
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        end = time.perf_counter()
+        self.profile.events.append((self.name, self.start - self.profile.origin, end - self.start, self.args))
+        return False
+
+def stage(name, **args):
+    """
+        Context manager timing a pipeline stage. args (e.g. guide name, items = number of copies
+        or polygons) are stored with the event; items is used for per-item times in the summary.
+    """
+    if PROFILE is None:
+        return NO_STAGE
+    return Stage(PROFILE, name, args)
+
+def count(name, n=1):
+    if PROFILE is not None:
+        PROFILE.counters[name] = PROFILE.counters.get(name, 0) + n
+
+def profiled(name=None):
+    """
+        Decorator timing every call of function as stage (function name by default).
+    """
+    def decorate(function):
+        stage_name = name or function.__name__
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if PROFILE is None:
+                return function(*args, **kwargs)
+            with Stage(PROFILE, stage_name, None):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def start_profile(trace_path, name="main"):
+    """
+        Start profiling if trace_path is set (e.g. from INK_NATURE_PROFILE), with a top-level stage name.
+    """
+    global PROFILE
+    if not trace_path:
+        return None
+    PROFILE = Profile()
+    PROFILE.top = Stage(PROFILE, name, None).__enter__()
+    return PROFILE
+
+def finish_profile(trace_path):
+    """
+        Stop profiling started by start_profile(), print summary table and write Chrome trace to trace_path.
+    """
+    global PROFILE
+    profile = PROFILE
+    if not trace_path or profile is None:
+        return None
+    profile.top.__exit__(None, None, None)
+    PROFILE = None
+    print(summary_table(profile))
+    write_chrome_trace(profile, trace_path)
+    return profile
+
+def summarize(profile):
+    """
+        Per stage name: calls, total and max time in seconds, items (sum of items argument).
+    """
+    summary = {}
+    for name, start, duration, args in profile.events:
+        entry = summary.setdefault(name, {"calls": 0, "total": 0.0, "max": 0.0, "items": 0})
+        entry["calls"] += 1
+        entry["total"] += duration
+        entry["max"] = max(entry["max"], duration)
+        if args and "items" in args:
+            entry["items"] += args["items"]
+    return summary
+
+def summary_table(profile):
+    summary = summarize(profile)
+    wall = max((summary[name]["total"] for name in summary), default=0.0)
+    lines = ["{:32s} {:>8s} {:>10s} {:>7s} {:>10s} {:>10s} {:>12s}".format("stage", "calls", "total s", "%", "mean ms", "max ms", "us/item")]
+    for name, entry in sorted(summary.items(), key=lambda item: -item[1]["total"]):
+        per_item = "{:12.2f}".format(entry["total"] / entry["items"] * 1e6) if entry["items"] else "{:>12s}".format("-")
+        lines.append("{:32s} {:8d} {:10.3f} {:7.1f} {:10.3f} {:10.3f} {}".format(
+            name, entry["calls"], entry["total"], 100.0 * entry["total"] / wall if wall > 0.0 else 0.0,
+            entry["total"] / entry["calls"] * 1e3, entry["max"] * 1e3, per_item))
+    for name, value in sorted(profile.counters.items()):
+        lines.append("{:32s} {:8d}".format(name, value))
+    return "\n".join(lines)
+
+def write_chrome_trace(profile, path):
+    """
+        Stages as complete ("X") events, counters as one counter ("C") event at the end.
+    """
+    pid = os.getpid()
+    events = [{"name": name, "ph": "X", "ts": start * 1e6, "dur": duration * 1e6, "pid": pid, "tid": 0, "args": args or {}}
+              for name, start, duration, args in profile.events]
+    end = max((start + duration for name, start, duration, args in profile.events), default=0.0)
+    events.append({"name": "counters", "ph": "C", "ts": end * 1e6, "pid": pid, "tid": 0, "args": profile.counters})
+    with open(path, "w") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
@@ -0,0 +1,87 @@
+
+# Tiled streaming generation: copies are grouped into square XY tiles, each tile is generated, written to
+# its own library .blend and released before the next one, so memory does not grow with instance count.
+# Every tile has a record (<tile>.json next to <tile>.blend), index.json in the tile directory collects
+# all records and maps tiles to libraries. Plain Python and NumPy, no bpy.
+
+import json
+import os
+import numpy as np
+
+def tile_keys(locations, tile_size):
+    # Integer (x, y) tile of every location (N, 3).
+    return np.floor(np.asarray(locations, dtype=np.float64).reshape(-1, 3)[:, :2] / tile_size).astype(np.int64)
+
+def group_by_tile(locations, tile_size, index=None):
+    """
+        {(x, y): indices} for every non-empty tile, indices are positions in locations
+        or the matching entries of index (e.g. copy indices).
+    """
+    keys = tile_keys(locations, tile_size)
+    index = np.arange(len(keys)) if index is None else np.asarray(index)
+    if len(keys) == 0:
+        return {}
+    unique, inverse = np.unique(keys, axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+    order = np.argsort(inverse, kind="stable")
+    splits = np.cumsum(np.bincount(inverse, minlength=len(unique)))[:-1]
+    return {(int(key[0]), int(key[1])): group for key, group in zip(unique, np.split(index[order], splits))}
+
+def tile_name(prefix, key):
+    return "{}_tile_{}_{}".format(prefix, key[0], key[1])
+
+def read_tile_record(tile_dir, name):
+    path = os.path.join(tile_dir, name + ".json")
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def write_json(path, data):
+    # Write under temporary name first, parallel workers may update the same directory.
+    tmp_path = "{}.{}.tmp".format(path, os.getpid())
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=1)
+    os.replace(tmp_path, path)
+
+def write_tile_record(tile_dir, name, record):
+    """
+        Store record of tile: library (file name relative to tile_dir), collection, key, bounds, radius, hash, ...
+    """
+    write_json(os.path.join(tile_dir, name + ".json"), record)
+
+def remove_tile(tile_dir, name):
+    for extension in (".blend", ".json", ".blend1"):
+        path = os.path.join(tile_dir, name + extension)
+        if os.path.exists(path):
+            os.remove(path)
+
+def tile_names(tile_dir):
+    if not os.path.isdir(tile_dir):
+        return []
+    return sorted(entry.name[:-5] for entry in os.scandir(tile_dir) if entry.name.endswith(".json") and entry.name != "index.json")
+
+def update_tile_index(tile_dir):
+    """
+        Rebuild index.json from records of all tiles in tile_dir. Returns {tile name: record}.
+    """
+    tiles = {name: read_tile_record(tile_dir, name) for name in tile_names(tile_dir)}
+    write_json(os.path.join(tile_dir, "index.json"), {"tiles": tiles})
+    return tiles
+
+def load_tile_index(tile_dir):
+    path = os.path.join(tile_dir, "index.json")
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)["tiles"]
+
+def tiles_in_region(tiles, region):
+    """
+        Records of tiles whose bounds overlap XY region (min_x, min_y, max_x, max_y), all tiles if region is None.
+    """
+    if region is None:
+        return dict(tiles)
+    return {name: record for name, record in tiles.items()
+            if record["bounds"][0][0] <= region[2] and record["bounds"][1][0] >= region[0]
+            and record["bounds"][0][1] <= region[3] and record["bounds"][1][1] >= region[1]}
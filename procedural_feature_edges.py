@@ -0,0 +1,187 @@
+
+# Blender 3.5.1.
+
+import json
+import os
+import sys
+import bpy
+import numpy as np
+
+# Shared generator package ink_nature/ is next to this script (or next to the .blend when run from text editor).
+for path in (os.path.dirname(os.path.abspath(__file__)), bpy.path.abspath("//")):
+    if path and path not in sys.path:
+        sys.path.append(path)
+
+from ink_nature.core import feature_edge_cache, feature_strokes, silhouette_edges, static_feature_edges
+from ink_nature.jobs import job_config
+from ink_nature.profiling import finish_profile, stage, start_profile
+from ink_nature.blender import add_object_to_collection, fill_curve_splines, read_mesh_arrays
+
+def get_stroke_curve(name, matrix_world, collection_name=None):
+    """
+        Curve object holding strokes of one source object, created on first use and reused per frame.
+    """
+    if name in bpy.data.objects:
+        return bpy.data.objects[name]
+    curve = bpy.data.curves.new(name, type='CURVE')
+    curve.dimensions = '3D'
+    curve.bevel_depth = 1.0
+    curve_obj = bpy.data.objects.new(name, curve)
+    curve_obj.matrix_world = matrix_world
+    if collection_name == None:
+        bpy.context.collection.objects.link(curve_obj)
+    else:
+        add_object_to_collection(curve_obj, collection_name)
+    return curve_obj
+
+def generate_feature_strokes(obj, cache, camera_obj, collection_name, settings):
+    """
+        Stroke feature edges of obj (static features plus silhouette for camera_obj) as perturbed
+        ink splines of a single curve object. Reuses the same curve object on every call.
+    """
+    selected = cache["static_features"]
+    matrix_world = np.array(obj.matrix_world)
+    if settings["include_silhouette"] and camera_obj is not None:
+        selected = selected | silhouette_edges(cache, matrix_world, np.array(camera_obj.matrix_world), camera_obj.data.type == 'ORTHO')
+    points, counts, radius = feature_strokes(cache, selected, matrix_world, obj.name, settings)
+    curve_obj = get_stroke_curve(obj.name + "_feature_edges", obj.matrix_world, collection_name)
+    curve_obj.matrix_world = obj.matrix_world
+    fill_curve_splines(curve_obj.data, points, counts, radius)
+    return curve_obj
+
+# Object name -> (feature edge cache, destination collection, settings); filled by main(), used per frame.
+FEATURE_EDGE_CACHE = {}
+
+@bpy.app.handlers.persistent
+def update_feature_strokes(scene, depsgraph=None):
+    """
+        frame_change_post handler: regenerate strokes of all cached objects for current camera.
+        Persistent, caches are rebuilt for the loaded file by reload_feature_strokes().
+    """
+    for obj_name, (cache, collection_name, settings) in FEATURE_EDGE_CACHE.items():
+        if obj_name not in bpy.data.objects:
+            continue
+        generate_feature_strokes(bpy.data.objects[obj_name], cache, scene.camera, collection_name, settings)
+
+def cache_feature_edges(base_obj, collection_name, settings, seed):
+    cache = feature_edge_cache(read_mesh_arrays(base_obj.data), seed, (base_obj.name,))
+    cache["static_features"] = static_feature_edges(cache, settings["crease_angle"], settings["include_boundary"], settings["include_material_borders"])
+    FEATURE_EDGE_CACHE[base_obj.name] = (cache, collection_name, settings)
+    return cache
+
+# Per-frame update survives saving: main() stores its parameters in a scene property, a registered text block
+# (run on file load when auto-run of Python scripts is enabled, e.g. `blender -b -y file.blend -a`) and a
+# load_post handler (later loads in the same session) rebuild the caches and install the handler.
+FEATURE_EDGES_PROPERTY = "ink_nature_feature_edges"
+FEATURE_EDGES_TEXT = "ink_nature_feature_edges.py"
+FEATURE_EDGES_TEXT_BODY = """# Generated by procedural_feature_edges.py: rebuilds feature edge caches and installs frame change handler on file load.
+import os
+import sys
+import bpy
+for path in (bpy.path.abspath("//"), {script_dir!r}):
+    if path and path not in sys.path and os.path.exists(os.path.join(path, "procedural_feature_edges.py")):
+        sys.path.append(path)
+import procedural_feature_edges
+procedural_feature_edges.register_feature_strokes()
+"""
+
+def install_feature_strokes(scene, enabled):
+    # Replace handlers from previous runs of this script.
+    for handlers, handler in ((bpy.app.handlers.frame_change_post, update_feature_strokes), (bpy.app.handlers.load_post, reload_feature_strokes)):
+        for h in [h for h in handlers if h.__name__ == handler.__name__]:
+            handlers.remove(h)
+    if not enabled:
+        if FEATURE_EDGES_TEXT in bpy.data.texts:
+            bpy.data.texts.remove(bpy.data.texts[FEATURE_EDGES_TEXT])
+        return
+    bpy.app.handlers.frame_change_post.append(update_feature_strokes)
+    bpy.app.handlers.load_post.append(reload_feature_strokes)
+    # Handler changes curve data during render.
+    scene.render.use_lock_interface = True
+    if FEATURE_EDGES_TEXT not in bpy.data.texts:
+        text = bpy.data.texts.new(FEATURE_EDGES_TEXT)
+        text.from_string(FEATURE_EDGES_TEXT_BODY.format(script_dir=os.path.dirname(os.path.abspath(__file__))))
+        text.use_module = True
+
+def register_feature_strokes(scene=None):
+    """
+        Rebuild feature edge caches from parameters main() stored in scene and (re)install per-frame handler,
+        e.g. after opening the saved .blend. Removes the handler if scene has no stored parameters.
+    """
+    scene = scene or bpy.context.scene
+    FEATURE_EDGE_CACHE.clear()
+    if FEATURE_EDGES_PROPERTY not in scene:
+        install_feature_strokes(scene, False)
+        return
+    stored = json.loads(scene[FEATURE_EDGES_PROPERTY])
+    for src_collection, dest_collection in stored["src_dest_collections"]:
+        if src_collection not in bpy.data.collections:
+            continue
+        for base_obj in bpy.data.collections[src_collection].all_objects:
+            if base_obj.type == "MESH":
+                cache_feature_edges(base_obj, dest_collection, stored["settings"], stored["seed"])
+    install_feature_strokes(scene, True)
+    update_feature_strokes(scene)
+
+@bpy.app.handlers.persistent
+def reload_feature_strokes(filepath=None):
+    # load_post handler: caches of the previous file do not match the loaded one.
+    register_feature_strokes()
+
+# Default parameters of main(), every job can override them (see run_jobs.py).
+CONFIG = {
+    "src_dest_collections": [("crown", "crown_generated_feature_edges")],
+    "settings": {
+        "crease_angle": np.radians(30.0),
+        "include_boundary": True,
+        "include_material_borders": True,
+        "include_silhouette": True,
+        # Length-adaptive resampling: points per stroke segment from its world-space length.
+        "stroke_spacing": 0.05,
+        "stroke_min_subdiv": 1,
+        "stroke_max_subdiv": 100,
+        "perturb": {"perturb_scale": 5.0, "perturb_strength": 0.4, "n_octaves": 1, "amplitude_scale": 0.5, "frequency_scale": 1.0}},
+    "update_per_frame": True}
+
+def main(seed=0, config=None):
+    """
+        Given collection of mesh objects, this script for each mesh finds feature edges
+        (crease, boundary, material border and camera silhouette) and creates displaced splines
+        along them, as a fast replacement for Freestyle lines.
+        With update_per_frame, silhouettes are recomputed on every frame change (e.g. during render)
+        from cached face normals and edge adjacency, also after reopening the saved .blend (see register_feature_strokes()).
+        Randomness is determined by seed, object name and edge index only, so strokes are stable between frames.
+        config overrides entries of CONFIG.
+        Returns names of destination collections.
+    """
+    config = job_config(CONFIG, config)
+    src_dest_collections = config["src_dest_collections"]
+    settings = dict(config["settings"], seed=seed)
+    update_per_frame = config["update_per_frame"]
+    camera_obj = bpy.context.scene.camera
+    # Per-stage timings and counters, enabled by INK_NATURE_PROFILE=<trace.json>: summary table and Chrome trace.
+    profile_path = os.environ.get("INK_NATURE_PROFILE")
+    start_profile(profile_path, "procedural_feature_edges")
+    FEATURE_EDGE_CACHE.clear()
+    for src_dest_collection in src_dest_collections:
+        # Apply on all objects in collection.
+        for base_obj in bpy.data.collections[src_dest_collection[0]].all_objects:
+            if base_obj.type != "MESH":
+                continue
+            with stage("mesh", guide=base_obj.name, items=len(base_obj.data.polygons)):
+                cache = cache_feature_edges(base_obj, src_dest_collection[1], settings, seed)
+                generate_feature_strokes(base_obj, cache, camera_obj, src_dest_collection[1], settings)
+    scene = bpy.context.scene
+    if update_per_frame:
+        scene[FEATURE_EDGES_PROPERTY] = json.dumps({"src_dest_collections": [list(pair) for pair in src_dest_collections], "settings": settings, "seed": seed})
+    elif FEATURE_EDGES_PROPERTY in scene:
+        del scene[FEATURE_EDGES_PROPERTY]
+    install_feature_strokes(scene, update_per_frame)
+    finish_profile(profile_path)
+    return [src_dest_collection[1] for src_dest_collection in src_dest_collections]
+
+#
+# Script entry point.
+#
+if __name__ == "__main__":
+    main()
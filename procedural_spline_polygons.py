@@ -1,124 +1,136 @@
 
 # Blender 3.5.1.
 
+import os
+import sys
 import bpy
-import mathutils
-import bmesh
+import numpy as np
 
-# Interpolate [a,b] using factor t.
-def lerp(t, a, b):
-    return (1.0 - t) * a + t * b
+# Shared generator package ink_nature/ is next to this script (or next to the .blend when run from text editor).
+for path in (os.path.dirname(os.path.abspath(__file__)), bpy.path.abspath("//")):
+    if path and path not in sys.path:
+        sys.path.append(path)
 
-def select_activate_only(objects=[]):
-    for obj in bpy.data.objects:
-        obj.select_set(False)
-    bpy.context.view_layer.objects.active = None 
-    for obj in objects:
-        obj.select_set(True)
-        bpy.context.view_layer.objects.active = obj
+from ink_nature.core import hash_arrays, mesh_strokes
+from ink_nature.cache import cache_load, cache_store
+from ink_nature.jobs import job_config
+from ink_nature.profiling import finish_profile, stage, start_profile
+from ink_nature.blender import (camera_view, convert_curve_to_mesh, create_curve_from_splines, create_empty_marker, default_cache_dir, find_generated,
+    is_up_to_date, read_mesh_arrays, remove_generated, tag_generated)
 
-# https://blender.stackexchange.com/questions/220072/check-using-name-if-a-collection-exists-in-blend-is-linked-to-scene
-def create_collection_if_not_exists(collection_name):
-    if collection_name not in bpy.data.collections:
-        new_collection = bpy.data.collections.new(collection_name)
-        bpy.context.scene.collection.children.link(new_collection) #Creates a new collection
-
-def add_object_to_collection(base_object, collection_name="collection"):
-    create_collection_if_not_exists(collection_name)
-    bpy.data.collections[collection_name].objects.link(base_object)
-
-def copy_obj(obj, collection_name):
-    obj_cpy = obj.copy()
-    obj_cpy.data = obj.data.copy()
-    obj_cpy.animation_data_clear()
-    if collection_name == None:
-        bpy.context.collection.objects.link(obj_cpy)
-    else:
-        add_object_to_collection(obj_cpy, collection_name)
-    return obj_cpy
-
-def perturb_curve(curve_obj, perturb_scale=1.0, perturb_strength=1.0, n_octaves=1, amplitude_scale=1.0, frequency_scale=1.0):
-    curve_type = curve_obj.data.splines[0].type
-    points = []
-    if curve_type == "BEZIER":
-        points = curve_obj.data.splines[0].bezier_points
-    if curve_type == "POLY" or curve_type == "NURBS":
-        points = curve_obj.data.splines[0].points
-    for point in points:
-        point_co = mathutils.Vector((point.co[0], point.co[1], point.co[2]))       
-        trans_vec = mathutils.noise.turbulence_vector(
-            point_co * perturb_scale * mathutils.noise.random(), 
-            n_octaves,
-            False, #hard
-            noise_basis='PERLIN_ORIGINAL',
-            amplitude_scale=amplitude_scale,
-            frequency_scale=frequency_scale) * perturb_strength
-        new_point_co = point_co + trans_vec
-        if curve_type == "BEZIER":
-            point.co = (new_point_co[0], new_point_co[1], new_point_co[2])
-        if curve_type == "POLY" or curve_type == "NURBS":
-            point.co = (new_point_co[0], new_point_co[1], new_point_co[2], point.co[3]) # Note: https://blender.stackexchange.com/questions/220812/what-is-the-4th-coordinate-of-spline-points
-    return curve_obj
-
-# TODO: move to collection
-def convert_mesh_to_curve(mesh_obj, curve_bevel_depth=0.01, curve_n_subdiv=0):
-    select_activate_only([mesh_obj])
-    bpy.ops.object.convert(target='CURVE') # creates POLY by default
-    curve = bpy.context.selected_objects[0]
-    curve.data.bevel_depth = curve_bevel_depth
-    bpy.ops.object.editmode_toggle()
-    if curve_n_subdiv > 0:
-        bpy.ops.curve.subdivide(number_cuts=curve_n_subdiv)
-    bpy.ops.object.editmode_toggle()
-    return curve
-
-def create_edge_mesh_from_polygon(base_obj: bpy.types.Object, polygon: bpy.types.MeshPolygon, collection_name=None):
+def mesh_cache_key(base_obj, mesh_arrays, settings, seed, shard_index, n_shards, view=None):
     """
-        Take mesh object and its polygon, create mesh containing only polygon edges.
-        Polygon: https://docs.blender.org/api/current/bpy.types.MeshPolygon.html#bpy.types.MeshPolygon
+        Hash of everything mesh_strokes() output depends on: mesh topology and coordinates,
+        transform (used for resampling), settings, seed, shard and camera view (if culling).
     """
-    # Fetch info on base object.
-    base_obj_vertices = base_obj.data.vertices
-    bm = bmesh.new()
-    for poly_edge_key in polygon.edge_keys:
-        bmv1 = bm.verts.new(base_obj_vertices[poly_edge_key[0]].co)
-        bmv2 = bm.verts.new(base_obj_vertices[poly_edge_key[1]].co)
-        bm.edges.new((bmv1, bmv2))
-    bmesh.ops.remove_doubles(bm, verts=bm.verts, dist=1e-4)
-    mesh = bpy.data.meshes.new("mesh")
-    obj_mesh = bpy.data.objects.new("obj", mesh)
-    if collection_name == None:
-        bpy.context.collection.objects.link(obj_mesh)
-    else:
-        add_object_to_collection(obj_mesh, collection_name)
-    bm.to_mesh(mesh)
-    bm.free()
-    return obj_mesh
+    return hash_arrays(
+        "procedural_spline_polygons", base_obj.name, settings, seed, shard_index, n_shards,
+        np.array(base_obj.matrix_world), *[mesh_arrays[name] for name in sorted(mesh_arrays)],
+        *([view["key"]] if view is not None else []))
+
+# Default parameters of main(), every job can override them (see run_jobs.py).
+CONFIG = {
+    "src_dest_collections": [("crown", "crown_generated_curve_edges")], # , ("pillars_base", "pillars_generated"), ("tree_hill_base", "tree_hill_generated_curves")
+    "settings": {
+        "curve_n_subdiv": 10, # Used when stroke_spacing is None.
+        # Length-adaptive resampling: points per stroke segment from its world-space length.
+        "stroke_spacing": 0.05,
+        "stroke_min_subdiv": 1,
+        "stroke_max_subdiv": 100,
+        "stroke_mode": "EDGES",
+        "n_strokes_per_edge": 1,
+        "min_dihedral_angle": 0.0, # Radians, flat interior edges below are skipped.
+        "include_boundary": True,
+        "include_seams": True,
+        "perturb": {"perturb_scale": 5.0, "perturb_strength": 0.4, "n_octaves": 1, "amplitude_scale": 0.5, "frequency_scale": 1.0},
+        # Camera culling and level of detail: at most one point per lod_pixel_spacing pixels on screen,
+        # stroke bounds are enlarged by cull_margin (world units) for perturbation.
+        "lod_pixel_spacing": 4.0,
+        "cull_margin": 0.5},
+    "use_camera_lod": False,
+    "convert_to_mesh": True,
+    "use_cache": True,
+    "cache_dir": None, # Default: generator_cache next to .blend file.
+    "cache_max_bytes": 2 * 1024**3,
+    "incremental": True}
 
-def main():
+def main(seed=0, shard_index=0, n_shards=1, config=None):
     """
         Given collection of mesh objects, this script for each mesh,
-        creates displaced splines around each mesh polygon.
+        creates displaced splines around mesh edges.
+        Stroke mode "EDGES" strokes every unique (selected) edge n_strokes_per_edge times,
+        stroke mode "POLYGONS" strokes outline of every polygon, so shared edges are stroked twice.
+        All strokes of a mesh are splines of one curve (or one mesh after conversion).
+        Work can be split across processes: shard_index/n_shards select every n_shards-th stroke.
+        With use_camera_lod, strokes outside the scene camera view over the scene frame range are skipped
+        and points are spaced by on-screen size instead of world-space length only.
+        Randomness is determined by seed, object name and stroke index only.
+        With use_cache, stroke arrays are stored on disk keyed by mesh data, transform, settings and seed,
+        and unchanged meshes are rebuilt from the cache without resampling or noise evaluation.
+        Generated objects are tagged with source mesh, shard and parameter hash. With incremental, only meshes whose
+        data or settings changed are regenerated, otherwise all previous outputs are replaced.
+        config overrides entries of CONFIG.
+        Returns names of destination collections.
     """
-    src_dest_collections = [("crown", "crown_generated_curve_edges")] # , ("pillars_base", "pillars_generated"), ("tree_hill_base", "tree_hill_generated_curves")
+    config = job_config(CONFIG, config)
+    src_dest_collections = config["src_dest_collections"]
+    settings = config["settings"]
+    use_camera_lod = config["use_camera_lod"]
+    convert_to_mesh = config["convert_to_mesh"]
+    use_cache = config["use_cache"]
+    cache_dir = config["cache_dir"] or default_cache_dir()
+    cache_max_bytes = config["cache_max_bytes"]
+    incremental = config["incremental"]
+    generator = "procedural_spline_polygons"
+    shard = "{}/{}".format(shard_index, n_shards)
+    # Per-stage timings and counters, enabled by INK_NATURE_PROFILE=<trace.json>: summary table and Chrome trace.
+    profile_path = os.environ.get("INK_NATURE_PROFILE")
+    start_profile(profile_path, generator)
+    scene = bpy.context.scene
+    view = camera_view(scene, scene.frame_start, scene.frame_end) if use_camera_lod else None
     for src_dest_collection in src_dest_collections:
-        # Apply on all objects in collection.
+        # Find stale outputs (changed or removed meshes) and remove them before generating.
+        generated = find_generated(src_dest_collection[1], generator)
+        stale = []
+        to_generate = []
         for base_obj in bpy.data.collections[src_dest_collection[0]].all_objects:
-            # For each base object face create spline.
-            for polygon in base_obj.data.polygons:
-                # For each polygon create mesh containing the same edges.
-                polygon_edges_mesh_obj = create_edge_mesh_from_polygon(base_obj, polygon, src_dest_collection[1])
-                # For each created polygon edges, create curve.
-                for i in range(1):
-                    edges_cpy = copy_obj(polygon_edges_mesh_obj, src_dest_collection[1])
-                    # Convert created mesh to curve.
-                    curr_bevel = lerp(0.02, 0.05, mathutils.noise.random())
-                    curve = convert_mesh_to_curve(edges_cpy, curve_bevel_depth=curr_bevel, curve_n_subdiv=10) # TODO: randomize
-                    # Pertub curve.
-                    perturb_curve(curve, perturb_scale=5.0, perturb_strength=0.4, n_octaves=1, amplitude_scale=0.5, frequency_scale=1.0)
-                    # Convert to mesh.
-                    select_activate_only([curve])
-                    bpy.ops.object.convert(target='MESH')
+            previous = generated.pop(base_obj.name, [])
+            if base_obj.type != "MESH":
+                continue
+            # Strokes of other shards are left to their workers, strokes generated with another number of shards are stale.
+            stale += [obj for obj in previous if obj.get("generator_shard", "").split("/")[-1] != str(n_shards)]
+            previous = [obj for obj in previous if obj.get("generator_shard") == shard]
+            mesh_arrays = read_mesh_arrays(base_obj.data)
+            cache_key = mesh_cache_key(base_obj, mesh_arrays, settings, seed, shard_index, n_shards, view)
+            param_hash = hash_arrays(cache_key, convert_to_mesh)
+            if incremental and is_up_to_date(previous, param_hash):
+                continue
+            stale += previous
+            to_generate.append((base_obj, mesh_arrays, cache_key, param_hash))
+        # Outputs of removed meshes are dropped by first shard only.
+        if shard_index == 0:
+            for objects in generated.values():
+                stale += objects
+        remove_generated(stale)
+        for base_obj, mesh_arrays, cache_key, param_hash in to_generate:
+            with stage("mesh", guide=base_obj.name, items=len(mesh_arrays["loop_start"])):
+                strokes = None
+                if use_cache:
+                    strokes = cache_load(cache_dir, cache_key)
+                if strokes is None:
+                    strokes = mesh_strokes(mesh_arrays, np.array(base_obj.matrix_world), base_obj.name, settings, seed, shard_index, n_shards, view)
+                    if use_cache:
+                        cache_store(cache_dir, cache_key, strokes, cache_max_bytes)
+                if len(strokes["counts"]) == 0:
+                    tag_generated(create_empty_marker(base_obj.name + "_edges", src_dest_collection[1]), generator, base_obj.name, shard, param_hash)
+                    continue
+                curve = create_curve_from_splines(base_obj.name + "_edges", strokes["points"], strokes["counts"], strokes["bevels"], cyclic=bool(strokes["cyclic"]), collection_name=src_dest_collection[1])
+                # Convert to mesh.
+                if convert_to_mesh:
+                    curve = convert_curve_to_mesh(curve)
+                tag_generated(curve, generator, base_obj.name, shard, param_hash)
+    finish_profile(profile_path)
+    return [src_dest_collection[1] for src_dest_collection in src_dest_collections]
 
 #
 # Script entry point.
@@ -0,0 +1,75 @@
+
+# Blender 3.5.1.
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+# Launcher runs with plain Python, jobs run inside `blender -b --python`.
+try:
+    import bpy
+except ImportError:
+    bpy = None
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+if script_dir not in sys.path:
+    sys.path.append(script_dir)
+
+from generate_farm import load_script, script_args
+from ink_nature.jobs import load_jobs
+
+def run_jobs(jobs_path, output_path=None):
+    """
+        Run all jobs of job file in current session and save the file once at the end.
+        Every generator script is imported once, guide curves and meshes read by several jobs
+        are read from Blender once (see ink_nature.blender.shared_lookups).
+    """
+    from ink_nature.blender import shared_lookups
+    jobs, job_output = load_jobs(jobs_path, script_dir)
+    output_path = output_path or job_output or bpy.data.filepath
+    modules = {}
+    start = time.perf_counter()
+    with shared_lookups():
+        for job in jobs:
+            if job["generator"] not in modules:
+                modules[job["generator"]] = load_script(job["generator"])
+            job_start = time.perf_counter()
+            dest_collections = modules[job["generator"]].main(seed=job["seed"], config=job["config"])
+            print("Job {}: {:.2f} s -> {}".format(job["name"], time.perf_counter() - job_start, ", ".join(dest_collections)))
+    print("{} jobs: {:.2f} s".format(len(jobs), time.perf_counter() - start))
+    if not output_path:
+        sys.exit("No output path: give --output or \"output\" in job file, or run on a saved .blend.")
+    bpy.ops.wm.save_as_mainfile(filepath=output_path)
+
+def main():
+    """
+        Run many generator jobs (script, seed and CONFIG overrides, see ink_nature.jobs) in one background
+        Blender session: the .blend is loaded once, all jobs run and the result is saved once.
+        Usage: python run_jobs.py --blender blender --blend scene.blend --jobs jobs.json [--output scene_generated.blend]
+        Inside Blender: blender -b scene.blend --python run_jobs.py -- run jobs.json [output.blend]
+    """
+    args = script_args()
+    if args and args[0] == "run":
+        run_jobs(os.path.abspath(args[1]), os.path.abspath(args[2]) if len(args) > 2 else None)
+        return
+    parser = argparse.ArgumentParser(description="Run generator jobs of a job file in one Blender session.")
+    parser.add_argument("--blender", default="blender", help="Blender executable.")
+    parser.add_argument("--blend", required=True, help="Source .blend with guide collections.")
+    parser.add_argument("--jobs", required=True, help="Job file (JSON), see ink_nature/jobs.py.")
+    parser.add_argument("--output", default=None, help="Output .blend (default: \"output\" of job file, else overwrite --blend).")
+    parsed = parser.parse_args(args)
+    # Check job file before starting Blender.
+    load_jobs(parsed.jobs, script_dir)
+    command = [parsed.blender, "-b", os.path.abspath(parsed.blend), "--python-exit-code", "1", "--python", os.path.abspath(__file__), "--", "run", os.path.abspath(parsed.jobs)]
+    if parsed.output:
+        command.append(os.path.abspath(parsed.output))
+    if subprocess.run(command).returncode != 0:
+        sys.exit("Jobs failed.")
+
+#
+# Script entry point.
+#
+if __name__ == "__main__":
+    main()
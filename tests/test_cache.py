@@ -0,0 +1,50 @@
+
+import os
+import tempfile
+import time
+import unittest
+import numpy as np
+
+from ink_nature import cache
+from ink_nature.cache import cache_load, cache_store
+
+class CacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.tmp_dir.name, "cache")
+        cache.CACHE_BYTES.clear()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_roundtrip(self):
+        self.assertIsNone(cache_load(self.cache_dir, "missing"))
+        cache_store(self.cache_dir, "key", {"points": np.arange(12.0).reshape(4, 3), "counts": np.array([4])}, 2**20)
+        arrays = cache_load(self.cache_dir, "key")
+        np.testing.assert_array_equal(arrays["points"], np.arange(12.0).reshape(4, 3))
+        np.testing.assert_array_equal(arrays["counts"], [4])
+
+    def test_eviction(self):
+        # Every entry is a little over 8000 bytes, three fit.
+        for i in range(6):
+            cache_store(self.cache_dir, "key{}".format(i), {"points": np.zeros(1000)}, 3 * 8500)
+            time.sleep(0.01)
+        self.assertEqual(sorted(os.listdir(self.cache_dir)), ["key3.npz", "key4.npz", "key5.npz"])
+
+    def test_eviction_least_recently_used(self):
+        for i in range(3):
+            cache_store(self.cache_dir, "key{}".format(i), {"points": np.zeros(1000)}, 3 * 8500)
+            time.sleep(0.01)
+        # Loading marks key0 as recently used, key1 is evicted instead.
+        self.assertIsNotNone(cache_load(self.cache_dir, "key0"))
+        time.sleep(0.01)
+        cache_store(self.cache_dir, "key3", {"points": np.zeros(1000)}, 3 * 8500)
+        self.assertEqual(sorted(os.listdir(self.cache_dir)), ["key0.npz", "key2.npz", "key3.npz"])
+
+    def test_entry_removed_by_other_process(self):
+        cache_store(self.cache_dir, "key", {"points": np.zeros(10)}, 2**20)
+        os.remove(os.path.join(self.cache_dir, "key.npz"))
+        self.assertIsNone(cache_load(self.cache_dir, "key"))
+
+if __name__ == "__main__":
+    unittest.main()
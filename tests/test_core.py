@@ -0,0 +1,335 @@
+
+# Tests of the NumPy core, run on plain Python: python -m pytest tests (or python -m unittest discover -s tests -t .).
+
+import unittest
+import numpy as np
+
+from ink_nature.core import (ANALYTIC_EASING, animation_parameters, dihedral_angles, edge_faces, evaluate_analytic_animation, feature_edge_cache, feature_strokes, mesh_strokes, perturb_curve_points, random_key, random_uniform,
+    resample_subdivisions, screen_sizes, select_stroke_edges, silhouette_edges, static_feature_edges, stroke_point_counters, subdivide_polygon_loops,
+    subdivide_segments)
+
+def curve_points(n_bezier=4, n_points=5):
+    # Buffers as ink_nature.blender.read_curve_points() returns, POLY/NURBS w set to 1..n_points.
+    bezier_co = np.stack((np.arange(n_bezier), np.zeros(n_bezier), np.zeros(n_bezier)), axis=1).astype(np.float32)
+    points_co = np.stack((np.arange(n_points), np.ones(n_points), np.zeros(n_points), np.arange(1, n_points + 1)), axis=1).astype(np.float32)
+    return {"bezier_co": bezier_co, "handle_left": bezier_co - (0.25, 0.0, 0.0), "handle_right": bezier_co + (0.25, 0.0, 0.0), "points_co": points_co}
+
+def cube():
+    """
+        Unit cube as mesh arrays (see ink_nature.blender.read_mesh_arrays): co, polygon loops,
+        edge_vertices, loop_edges and outward polygon normals.
+    """
+    co = np.array([(x, y, z) for x in (0.0, 1.0) for y in (0.0, 1.0) for z in (0.0, 1.0)])
+    polygons = [(0, 1, 3, 2), (4, 6, 7, 5), (0, 4, 5, 1), (2, 3, 7, 6), (0, 2, 6, 4), (1, 5, 7, 3)]
+    normals = np.array([(-1, 0, 0), (1, 0, 0), (0, -1, 0), (0, 1, 0), (0, 0, -1), (0, 0, 1)], dtype=np.float64)
+    loop_vertices = np.array([v for polygon in polygons for v in polygon])
+    loop_total = np.full(len(polygons), 4)
+    loop_start = np.arange(len(polygons)) * 4
+    edges = {}
+    loop_edges = []
+    for polygon in polygons:
+        for a, b in zip(polygon, polygon[1:] + polygon[:1]):
+            loop_edges.append(edges.setdefault(tuple(sorted((a, b))), len(edges)))
+    edge_vertices = np.array(sorted(edges, key=edges.get))
+    return co, loop_vertices, loop_start, loop_total, edge_vertices, np.array(loop_edges), normals
+
+def cube_mesh(n_polygons=6):
+    # Mesh arrays of cube (see ink_nature.blender.read_mesh_arrays) with its first n_polygons polygons.
+    co, loop_vertices, loop_start, loop_total, edge_vertices, loop_edges, normals = cube()
+    n_loops = 4 * n_polygons
+    return {
+        "co": co,
+        "edge_vertices": edge_vertices,
+        "is_seam": np.zeros(len(edge_vertices), dtype=bool),
+        "loop_vertices": loop_vertices[:n_loops],
+        "loop_edges": loop_edges[:n_loops],
+        "loop_start": loop_start[:n_polygons],
+        "loop_total": loop_total[:n_polygons],
+        "material_index": np.zeros(n_polygons, dtype=np.int64),
+        "normals": normals[:n_polygons],
+        "centers": co[loop_vertices[:n_loops]].reshape(-1, 4, 3).mean(axis=1)}
+
+# Settings of mesh_strokes() as in procedural_spline_polygons.CONFIG.
+STROKE_SETTINGS = {
+    "curve_n_subdiv": 10,
+    "stroke_spacing": 0.25,
+    "stroke_min_subdiv": 1,
+    "stroke_max_subdiv": 100,
+    "stroke_mode": "EDGES",
+    "n_strokes_per_edge": 1,
+    "min_dihedral_angle": 0.0,
+    "include_boundary": True,
+    "include_seams": True,
+    "perturb": {"perturb_scale": 5.0, "perturb_strength": 0.4, "n_octaves": 1, "amplitude_scale": 0.5, "frequency_scale": 1.0},
+    "lod_pixel_spacing": 4.0,
+    "cull_margin": 0.5}
+
+class PerturbTest(unittest.TestCase):
+    def test_perturb_curve_points(self):
+        original = curve_points()
+        perturbed = perturb_curve_points(original, perturb_scale=0.7, perturb_strength=2.0, seed=1)
+        # Input buffers are not modified.
+        np.testing.assert_array_equal(original["bezier_co"], curve_points()["bezier_co"])
+        offset = perturbed["bezier_co"] - original["bezier_co"]
+        self.assertGreater(np.abs(offset).max(), 0.0)
+        # Handles follow their control point.
+        np.testing.assert_allclose(perturbed["handle_left"] - original["handle_left"], offset, atol=1e-6)
+        np.testing.assert_allclose(perturbed["handle_right"] - original["handle_right"], offset, atol=1e-6)
+        # POLY/NURBS w is kept.
+        np.testing.assert_array_equal(perturbed["points_co"][:, 3], original["points_co"][:, 3])
+        self.assertGreater(np.abs(perturbed["points_co"][:, :3] - original["points_co"][:, :3]).max(), 0.0)
+
+    def test_deterministic(self):
+        a = perturb_curve_points(curve_points(), seed=3)
+        b = perturb_curve_points(curve_points(), seed=3)
+        c = perturb_curve_points(curve_points(), seed=4)
+        for name in a:
+            np.testing.assert_array_equal(a[name], b[name])
+        self.assertFalse(np.array_equal(a["bezier_co"], c["bezier_co"]))
+
+    def test_empty(self):
+        perturbed = perturb_curve_points(curve_points(0, 0))
+        self.assertEqual(len(perturbed["bezier_co"]), 0)
+        self.assertEqual(len(perturbed["points_co"]), 0)
+
+class EdgeAdjacencyTest(unittest.TestCase):
+    def test_cube(self):
+        co, loop_vertices, loop_start, loop_total, edge_vertices, loop_edges, normals = cube()
+        face_count, faces = edge_faces(len(edge_vertices), loop_edges, loop_total)
+        self.assertEqual(len(edge_vertices), 12)
+        np.testing.assert_array_equal(face_count, np.full(12, 2))
+        self.assertTrue(np.all(faces >= 0))
+        angles = dihedral_angles(normals, faces, face_count)
+        np.testing.assert_allclose(angles, np.full(12, np.pi / 2))
+        is_seam = np.zeros(12, dtype=bool)
+        self.assertTrue(select_stroke_edges(face_count, angles, is_seam, min_dihedral_angle=np.radians(80.0)).all())
+        self.assertFalse(select_stroke_edges(face_count, angles, is_seam, min_dihedral_angle=np.radians(100.0)).any())
+        is_seam[3] = True
+        np.testing.assert_array_equal(np.flatnonzero(select_stroke_edges(face_count, angles, is_seam, min_dihedral_angle=np.pi)), [3])
+        self.assertFalse(select_stroke_edges(face_count, angles, is_seam, min_dihedral_angle=np.pi, include_seams=False).any())
+
+    def test_open_cube(self):
+        # Without the last polygon (+Z), its 4 edges are boundary edges.
+        co, loop_vertices, loop_start, loop_total, edge_vertices, loop_edges, normals = cube()
+        face_count, faces = edge_faces(len(edge_vertices), loop_edges[:-4], loop_total[:-1])
+        self.assertEqual((face_count == 1).sum(), 4)
+        np.testing.assert_array_equal(faces[face_count == 1, 1], -1)
+        angles = dihedral_angles(normals, faces, face_count)
+        np.testing.assert_array_equal(angles[face_count == 1], 0.0)
+        is_seam = np.zeros(12, dtype=bool)
+        selected = select_stroke_edges(face_count, angles, is_seam, min_dihedral_angle=np.pi)
+        np.testing.assert_array_equal(selected, face_count == 1)
+        self.assertFalse(select_stroke_edges(face_count, angles, is_seam, min_dihedral_angle=np.pi, include_boundary=False).any())
+
+class ResampleTest(unittest.TestCase):
+    def test_resample_subdivisions(self):
+        co = np.array([(0.0, 0.0, 0.0), (1.0, 0.0, 0.0), (0.0, 3.0, 0.0), (0.0, 0.0, 0.05)])
+        v0 = np.array([0, 0, 0])
+        v1 = np.array([1, 2, 3])
+        # Points at most 0.25 apart: 3 points inserted on length 1, 11 on length 3, none on short segments.
+        np.testing.assert_array_equal(resample_subdivisions(co, v0, v1, 0.25), [3, 11, 0])
+        np.testing.assert_array_equal(resample_subdivisions(co, v0, v1, 0.25, max_subdiv=5), [3, 5, 0])
+        np.testing.assert_array_equal(resample_subdivisions(co, v0, v1, 0.25, min_subdiv=1, max_subdiv=5), [3, 5, 1])
+
+    def test_subdivide_segments(self):
+        co = np.array([(0.0, 0.0, 0.0), (1.0, 0.0, 0.0), (1.0, 1.0, 0.0)])
+        v0 = np.array([0, 1])
+        v1 = np.array([1, 2])
+        points, counts = subdivide_segments(co, v0, v1, np.array([0, 3]), include_end=False)
+        np.testing.assert_array_equal(counts, [1, 4])
+        self.assertEqual(len(points), 5)
+        np.testing.assert_allclose(points[2], (1.0, 0.25, 0.0))
+        points, counts = subdivide_segments(co, v0, v1, 1, include_end=True)
+        np.testing.assert_array_equal(counts, [3, 3])
+        np.testing.assert_allclose(points[:3], [(0.0, 0.0, 0.0), (0.5, 0.0, 0.0), (1.0, 0.0, 0.0)])
+
+    def test_subdivide_polygon_loops(self):
+        co, loop_vertices, loop_start, loop_total = cube()[:4]
+        points, counts = subdivide_polygon_loops(co, loop_vertices, loop_start, loop_total, n_subdiv=2)
+        np.testing.assert_array_equal(counts, np.full(6, 4 * 3))
+        self.assertEqual(len(points), counts.sum())
+        # Per segment counts: only the first segment of every polygon is subdivided.
+        n_subdiv = np.where(np.arange(len(loop_vertices)) % 4 == 0, 1, 0)
+        points, counts = subdivide_polygon_loops(co, loop_vertices, loop_start, loop_total, n_subdiv)
+        np.testing.assert_array_equal(counts, np.full(6, 5))
+
+class FeatureEdgesTest(unittest.TestCase):
+    def test_static_feature_edges(self):
+        cache = feature_edge_cache(cube_mesh())
+        # All cube edges are 90 degree creases.
+        self.assertTrue(static_feature_edges(cache, np.radians(30.0)).all())
+        self.assertFalse(static_feature_edges(cache, np.radians(100.0)).any())
+        # Material borders around the +Z polygon.
+        mesh = cube_mesh()
+        mesh["material_index"][5] = 1
+        selected = static_feature_edges(feature_edge_cache(mesh), np.radians(100.0))
+        self.assertEqual(selected.sum(), 4)
+        self.assertFalse(static_feature_edges(feature_edge_cache(mesh), np.radians(100.0), include_material_borders=False).any())
+        # Boundary of open cube.
+        cache = feature_edge_cache(cube_mesh(5))
+        np.testing.assert_array_equal(static_feature_edges(cache, np.radians(100.0)), cache["face_count"] == 1)
+        self.assertFalse(static_feature_edges(cache, np.radians(100.0), include_boundary=False).any())
+
+    def test_silhouette_edges(self):
+        mesh = cube_mesh()
+        cache = feature_edge_cache(mesh)
+        # Camera above the cube looking down -Z sees only the +Z polygon, its outline is the silhouette.
+        camera_matrix = np.eye(4)
+        camera_matrix[:3, 3] = (0.5, 0.5, 10.0)
+        top_edges = np.all(mesh["co"][mesh["edge_vertices"]][:, :, 2] == 1.0, axis=1)
+        np.testing.assert_array_equal(silhouette_edges(cache, np.eye(4), camera_matrix), top_edges)
+        np.testing.assert_array_equal(silhouette_edges(cache, np.eye(4), camera_matrix, ortho=True), top_edges)
+        # Facing is tested in object space: moving the object under the camera does not change it.
+        matrix_world = np.eye(4)
+        matrix_world[:3, 3] = (3.0, -2.0, 0.0)
+        camera_matrix[:3, 3] += matrix_world[:3, 3]
+        np.testing.assert_array_equal(silhouette_edges(cache, matrix_world, camera_matrix), top_edges)
+
+class RandomTest(unittest.TestCase):
+    def test_deterministic(self):
+        counter = np.arange(100)
+        np.testing.assert_array_equal(random_uniform(3, ("guide", "scale"), counter), random_uniform(3, ("guide", "scale"), counter))
+        self.assertEqual(random_key(3, ("guide", "scale")), random_key(3, ("guide", "scale")))
+
+    def test_keyed(self):
+        counter = np.arange(100)
+        values = random_uniform(0, ("guide", "scale"), counter)
+        self.assertFalse(np.array_equal(values, random_uniform(1, ("guide", "scale"), counter)))
+        self.assertFalse(np.array_equal(values, random_uniform(0, ("guide", "rotation"), counter)))
+        self.assertNotEqual(random_key(0, ("a",)), random_key(0, ("b",)))
+
+    def test_counter_based(self):
+        # Value of a counter does not depend on the other counters.
+        values = random_uniform(0, ("guide",), np.arange(10))
+        np.testing.assert_array_equal(random_uniform(0, ("guide",), np.array([7, 2])), values[[7, 2]])
+        self.assertEqual(random_uniform(0, ("guide",), np.arange(6).reshape(2, 3)).shape, (2, 3))
+
+    def test_range(self):
+        values = random_uniform(0, ("guide",), np.arange(10000))
+        self.assertTrue(np.all((values >= 0.0) & (values < 1.0)))
+        self.assertAlmostEqual(values.mean(), 0.5, delta=0.02)
+
+    def test_stroke_point_counters(self):
+        counters = stroke_point_counters(np.array([4, 9]), np.array([2, 3]))
+        np.testing.assert_array_equal(counters, [4 << 32, (4 << 32) | 1, 9 << 32, (9 << 32) | 1, (9 << 32) | 2])
+        self.assertEqual(len(stroke_point_counters(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64))), 0)
+
+class MeshStrokesTest(unittest.TestCase):
+    def test_counts(self):
+        strokes = mesh_strokes(cube_mesh(), np.eye(4), "cube", STROKE_SETTINGS)
+        # 12 edges of length 1, 3 points inserted on each.
+        np.testing.assert_array_equal(strokes["counts"], np.full(12, 5))
+        self.assertEqual(strokes["points"].shape, (60, 3))
+        self.assertEqual(len(strokes["bevels"]), 12)
+        self.assertFalse(strokes["cyclic"])
+        strokes = mesh_strokes(cube_mesh(), np.eye(4), "cube", dict(STROKE_SETTINGS, stroke_mode="POLYGONS"))
+        np.testing.assert_array_equal(strokes["counts"], np.full(6, 16))
+        self.assertTrue(strokes["cyclic"])
+
+    def test_shards(self):
+        # Shards split strokes, strokes do not depend on the number of shards.
+        strokes = mesh_strokes(cube_mesh(), np.eye(4), "cube", STROKE_SETTINGS, seed=2)
+        shards = [mesh_strokes(cube_mesh(), np.eye(4), "cube", STROKE_SETTINGS, seed=2, shard_index=i, n_shards=5) for i in range(5)]
+        self.assertEqual(sum(len(shard["counts"]) for shard in shards), 12)
+        np.testing.assert_array_equal(shards[1]["points"], strokes["points"].reshape(12, 5, 3)[1::5].reshape(-1, 3))
+
+    def test_no_strokes(self):
+        empty = {name: values[:0] for name, values in cube_mesh().items()}
+        cases = [
+            (cube_mesh(), dict(STROKE_SETTINGS, min_dihedral_angle=np.pi), 0, 1),
+            (empty, STROKE_SETTINGS, 0, 1),
+            (empty, dict(STROKE_SETTINGS, stroke_mode="POLYGONS"), 0, 1),
+            (cube_mesh(), STROKE_SETTINGS, 13, 20)]
+        for mesh, settings, shard_index, n_shards in cases:
+            strokes = mesh_strokes(mesh, np.eye(4), "cube", settings, shard_index=shard_index, n_shards=n_shards)
+            self.assertEqual(len(strokes["counts"]), 0)
+            self.assertEqual(strokes["points"].shape, (0, 3))
+        points, counts, radius = feature_strokes(feature_edge_cache(cube_mesh()), np.zeros(12, dtype=bool), np.eye(4), "cube", dict(STROKE_SETTINGS, seed=0))
+        self.assertEqual(len(counts), 0)
+
+def bezier_fcurve(frame_start, frame_end, value_start, value_end, n_samples=101):
+    """
+        (frames, values) sampled along a 2-keyframe BEZIER fcurve with auto clamped handles:
+        horizontal handles a third of the way to the other keyframe.
+    """
+    t = np.linspace(0.0, 1.0, n_samples)[:, np.newaxis]
+    third = (frame_end - frame_start) / 3.0
+    control = np.array([(frame_start, value_start), (frame_start + third, value_start), (frame_end - third, value_end), (frame_end, value_end)])
+    curve = (1 - t)**3 * control[0] + 3 * (1 - t)**2 * t * control[1] + 3 * (1 - t) * t**2 * control[2] + t**3 * control[3]
+    return curve[:, 0], curve[:, 1]
+
+class AnalyticAnimationTest(unittest.TestCase):
+    def test_bezier(self):
+        params = animation_parameters(10, 250, 0.1, np.array([1.0, 0.5]), ANALYTIC_EASING['BEZIER'])
+        for frame, value in zip(*bezier_fcurve(10.0, 250.0, 0.1, 1.0)):
+            self.assertAlmostEqual(evaluate_analytic_animation(params, frame)[0], value, places=9)
+        frames, values = bezier_fcurve(10.0, 250.0, 0.1, 0.5)
+        self.assertAlmostEqual(evaluate_analytic_animation(params, frames[30])[1], values[30], places=9)
+
+    def test_linear_and_hold(self):
+        params = animation_parameters(0, 100, 2.0, 4.0, ANALYTIC_EASING['LINEAR'])
+        np.testing.assert_allclose(evaluate_analytic_animation(params, 25.0), [2.5])
+        # Values are held before the first and after the last keyframe.
+        np.testing.assert_allclose(evaluate_analytic_animation(params, -10.0), [2.0])
+        np.testing.assert_allclose(evaluate_analytic_animation(params, 150.0), [4.0])
+
+def ortho_view(ortho_scale=20.0, resolution=1000.0, clip_start=0.1, clip_end=100.0):
+    # Orthographic camera at (0, 0, 10) looking down -Z.
+    projection = np.array([
+        [2.0 / ortho_scale, 0.0, 0.0, 0.0],
+        [0.0, 2.0 / ortho_scale, 0.0, 0.0],
+        [0.0, 0.0, -2.0 / (clip_end - clip_start), -(clip_end + clip_start) / (clip_end - clip_start)],
+        [0.0, 0.0, 0.0, 1.0]])
+    world_to_camera = np.eye(4)
+    world_to_camera[2, 3] = -10.0
+    return {"view_projections": (projection @ world_to_camera)[np.newaxis], "resolution": np.array([resolution, resolution]), "ortho": True}
+
+def perspective_view(resolution=1000.0, clip_start=0.1, clip_end=100.0):
+    # 90 degree perspective camera at (0, 0, 10) looking down -Z.
+    projection = np.array([
+        [1.0, 0.0, 0.0, 0.0],
+        [0.0, 1.0, 0.0, 0.0],
+        [0.0, 0.0, -(clip_end + clip_start) / (clip_end - clip_start), -2.0 * clip_end * clip_start / (clip_end - clip_start)],
+        [0.0, 0.0, -1.0, 0.0]])
+    world_to_camera = np.eye(4)
+    world_to_camera[2, 3] = -10.0
+    return {"view_projections": (projection @ world_to_camera)[np.newaxis], "resolution": np.array([resolution, resolution])}
+
+class ScreenSizesTest(unittest.TestCase):
+    def test_perspective(self):
+        # Sphere of radius 1 at distance 10 with 90 degree field of view on 1000 pixels is 100 pixels wide.
+        pixels = screen_sizes([(0.0, 0.0, 0.0), (0.0, 0.0, 20.0), (0.0, 0.0, 10.5), (100.0, 0.0, 0.0)], 1.0, perspective_view())
+        np.testing.assert_allclose(pixels[0], 100.0)
+        # Behind camera, crossing camera plane, outside view.
+        self.assertEqual(pixels[1], 0.0)
+        self.assertEqual(pixels[2], np.inf)
+        self.assertEqual(pixels[3], 0.0)
+
+    def test_perspective_side_planes(self):
+        # Center outside the 90 degree view by 1.2 at distance 10, sphere of radius 1 still reaches into it
+        # (distance of center to side plane is 1.2 / sqrt(2)). Farther out it does not.
+        pixels = screen_sizes([(11.2, 0.0, 0.0), (0.0, -11.2, 0.0), (11.5, 0.0, 0.0)], 1.0, perspective_view())
+        self.assertGreater(pixels[0], 0.0)
+        self.assertGreater(pixels[1], 0.0)
+        self.assertEqual(pixels[2], 0.0)
+
+    def test_ortho(self):
+        pixels = screen_sizes([(0.0, 0.0, 0.0), (0.0, 0.0, -50.0), (50.0, 50.0, 0.0), (0.0, 0.0, 20.0), (0.0, 0.0, -200.0), (10.5, 0.0, 0.0)], 2.0, ortho_view())
+        # Diameter 4 of ortho_scale 20 on 1000 pixels, independent of depth.
+        np.testing.assert_allclose(pixels[:2], [200.0, 200.0])
+        # Outside view, behind camera, beyond clip end.
+        np.testing.assert_array_equal(pixels[2:5], 0.0)
+        # Partially inside.
+        self.assertEqual(pixels[5], 200.0)
+
+    def test_samples(self):
+        # Largest size over camera samples, visible if visible in any sample.
+        view = ortho_view()
+        moved = view["view_projections"][0].copy()
+        moved[0, 3] -= 10.0 # Camera moved by 100 units along +X.
+        view["view_projections"] = np.stack((view["view_projections"][0], moved))
+        pixels = screen_sizes([(0.0, 0.0, 0.0), (100.0, 0.0, 0.0), (300.0, 0.0, 0.0)], 2.0, view)
+        np.testing.assert_allclose(pixels, [200.0, 200.0, 0.0])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+
+import json
+import os
+import tempfile
+import unittest
+
+from ink_nature.jobs import job_config, load_jobs
+
+DEFAULTS = {"dest_collection": "generated", "n_copies": 10, "settings": {"perturb": True, "spacing": 0.1}}
+
+class JobConfigTest(unittest.TestCase):
+    def test_defaults(self):
+        self.assertEqual(job_config(DEFAULTS), DEFAULTS)
+        self.assertEqual(job_config(DEFAULTS, {}), DEFAULTS)
+
+    def test_overrides(self):
+        config = job_config(DEFAULTS, {"n_copies": 3, "settings": {"spacing": 0.5}})
+        self.assertEqual(config["n_copies"], 3)
+        self.assertEqual(config["settings"], {"perturb": True, "spacing": 0.5})
+        # Defaults are not modified.
+        self.assertEqual(DEFAULTS["settings"]["spacing"], 0.1)
+
+    def test_unknown(self):
+        with self.assertRaises(KeyError):
+            job_config(DEFAULTS, {"n_copie": 3})
+        with self.assertRaises(KeyError):
+            job_config(DEFAULTS, {"settings": {"spacin": 0.5}})
+
+class LoadJobsTest(unittest.TestCase):
+    def test_load(self):
+        with tempfile.TemporaryDirectory() as job_dir:
+            open(os.path.join(job_dir, "generator.py"), "w").close()
+            path = os.path.join(job_dir, "jobs.json")
+            with open(path, "w") as f:
+                json.dump({
+                    "output": "out.blend",
+                    "defaults": {"seed": 2, "config": {"n_copies": 5}},
+                    "jobs": [{"generator": "generator.py"}, {"generator": "generator.py", "seed": 3, "name": "b", "config": {"dest_collection": "b"}}]}, f)
+            jobs, output = load_jobs(path)
+            self.assertEqual(output, os.path.join(job_dir, "out.blend"))
+            self.assertEqual([job["seed"] for job in jobs], [2, 3])
+            self.assertEqual(jobs[0]["name"], "0:generator")
+            self.assertEqual(jobs[1]["config"], {"n_copies": 5, "dest_collection": "b"})
+            self.assertEqual(jobs[0]["generator"], os.path.join(job_dir, "generator.py"))
+
+    def test_missing_generator(self):
+        with tempfile.TemporaryDirectory() as job_dir:
+            path = os.path.join(job_dir, "jobs.json")
+            with open(path, "w") as f:
+                json.dump({"jobs": [{"generator": "missing.py"}]}, f)
+            with self.assertRaises(FileNotFoundError):
+                load_jobs(path)
+
+if __name__ == "__main__":
+    unittest.main()
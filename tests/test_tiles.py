@@ -0,0 +1,38 @@
+
+import os
+import tempfile
+import unittest
+import numpy as np
+
+from ink_nature.tiles import group_by_tile, load_tile_index, remove_tile, tile_name, tiles_in_region, update_tile_index, write_tile_record
+
+class TilesTest(unittest.TestCase):
+    def test_group_by_tile(self):
+        locations = np.array([(0.5, 0.5, 0.0), (-0.5, 0.5, 3.0), (1.5, 0.2, 0.0), (0.1, 0.9, 0.0)])
+        groups = group_by_tile(locations, 1.0, index=np.array([10, 11, 12, 13]))
+        self.assertEqual(sorted(groups), [(-1, 0), (0, 0), (1, 0)])
+        np.testing.assert_array_equal(groups[(0, 0)], [10, 13])
+        self.assertEqual(group_by_tile(np.zeros((0, 3)), 1.0), {})
+
+    def test_index(self):
+        with tempfile.TemporaryDirectory() as tile_dir:
+            for key in ((0, 0), (1, 0), (5, 5)):
+                name = tile_name("grass", key)
+                write_tile_record(tile_dir, name, {
+                    "library": name + ".blend",
+                    "key": list(key),
+                    "bounds": [[key[0] * 10.0, key[1] * 10.0, 0.0], [key[0] * 10.0 + 10.0, key[1] * 10.0 + 10.0, 1.0]],
+                    "hash": "h"})
+            tiles = update_tile_index(tile_dir)
+            self.assertEqual(sorted(tiles), ["grass_tile_0_0", "grass_tile_1_0", "grass_tile_5_5"])
+            self.assertEqual(load_tile_index(tile_dir), tiles)
+            self.assertEqual(sorted(tiles_in_region(tiles, (5.0, 5.0, 15.0, 8.0))), ["grass_tile_0_0", "grass_tile_1_0"])
+            self.assertEqual(sorted(tiles_in_region(tiles, (49.0, 49.0, 51.0, 51.0))), ["grass_tile_5_5"])
+            self.assertEqual(tiles_in_region(tiles, (-5.0, -5.0, -1.0, -1.0)), {})
+            self.assertEqual(tiles_in_region(tiles, None), tiles)
+            remove_tile(tile_dir, "grass_tile_5_5")
+            self.assertEqual(sorted(update_tile_index(tile_dir)), ["grass_tile_0_0", "grass_tile_1_0"])
+            self.assertFalse(os.path.exists(os.path.join(tile_dir, "grass_tile_5_5.json")))
+
+if __name__ == "__main__":
+    unittest.main()